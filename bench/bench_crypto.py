@@ -0,0 +1,104 @@
+"""
+Encrypted compression: the streaming AEAD frames of 'pzyp.py -p'
+versus the previous path, which compressed the file, read it back,
+encrypted it whole with Fernet (key from a single MD5 of the password)
+and rewrote it. Reports time, output size and peak memory (traced
+Python allocations, in a separate run) for compression with
+encryption and for decryption with decompression.
+
+    Usage:
+        python bench/bench_crypto.py [SIZE_IN_MB]
+"""
+
+import base64
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pzyp as pz
+from bench_memory import gen_file
+
+PASSWORD = 'correct horse battery staple'
+
+
+def fernet_key(password: str) -> bytes:
+    return base64.urlsafe_b64encode(hashlib.md5(password.encode()).hexdigest().encode())
+#:
+
+def fernet_compress(in_path: str, out_path: str):
+    from cryptography.fernet import Fernet
+    pz.encode(in_path, out_path)
+    with open(out_path, 'rb') as f:
+        data = f.read()
+    with open(out_path, 'wb') as f:
+        f.write(Fernet(fernet_key(PASSWORD)).encrypt(data))
+#:
+
+def fernet_decompress(in_path: str, out_path: str):
+    from cryptography.fernet import Fernet
+    with open(in_path, 'rb') as f:
+        data = Fernet(fernet_key(PASSWORD)).decrypt(f.read())
+    with io.BytesIO(data) as in_, open(out_path, 'wb') as out:
+        header = pz.Header.read(in_)
+        pz.decode_stream(in_, out.write, header.context, header)
+#:
+
+def aead_compress(in_path: str, out_path: str):
+    pz.encode(in_path, out_path, None, pz.level_context(pz.DEFAULT_LEVEL), PASSWORD)
+#:
+
+def aead_decompress(in_path: str, out_path: str):
+    with open(in_path, 'rb') as in_, open(out_path, 'wb') as out:
+        header = pz.Header.read(in_)
+        pz.decode_stream(in_, out.write, header.context, header, PASSWORD)
+#:
+
+def measure(func, *args):
+    """
+    Runs C{func(*args)} twice: once timed, once with C{tracemalloc}
+    for the peak memory (tracing slows the Python codec down far more
+    than the C crypto, so it can't be on while timing).
+    """
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak
+#:
+
+def main():
+    size = int(float(sys.argv[1]) * 1024 * 1024) if len(sys.argv) > 1 else 2 * 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        orig = os.path.join(tmp, 'orig.txt')
+        gen_file(orig, size)
+        print(f'{size / (1024 * 1024):.1f} MB input')
+        print(f'{"path":>8} {"comp s":>8} {"comp MB":>8} {"size":>9} {"dec s":>7} {"dec MB":>7}')
+        for name, compress, decompress in (
+                ('fernet', fernet_compress, fernet_decompress),
+                ('aead', aead_compress, aead_decompress),
+        ):
+            comp = os.path.join(tmp, f'{name}.lzs')
+            back = os.path.join(tmp, f'{name}.out')
+            t_comp, m_comp = measure(compress, orig, comp)
+            t_dec, m_dec = measure(decompress, comp, back)
+            with open(orig, 'rb') as f1, open(back, 'rb') as f2:
+                assert f1.read() == f2.read(), f'{name}: round trip differs'
+            print(
+                f'{name:>8} {t_comp:>8.2f} {m_comp / 2**20:>8.1f} {os.path.getsize(comp):>9}'
+                f' {t_dec:>7.2f} {m_dec / 2**20:>7.1f}'
+            )
+#:
+
+if __name__ == '__main__':
+    main()
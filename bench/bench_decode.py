@@ -0,0 +1,98 @@
+"""
+Decompression checks and throughput. First, random binary data of
+several sizes (all byte values, '\r\n' included) goes through
+compress/decode and must come back byte for byte. Then decode speed
+(MB/s of decoded data), on the 'text' corpus of corpus.py, is measured
+with a binary sink, and with the old path that turned the output into
+UTF-8 text as reference.
+
+    Usage:
+        python bench/bench_decode.py [SIZE_IN_MB] [LEVEL]
+"""
+
+import codecs
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pzyp as pz
+from corpus import generate
+
+SIZES = [0, 1, 2, 17, 255, 4096, 65_535, 65_536, 65_537, 300_000]
+
+
+def gen_binary(size: int, seed=1234) -> bytes:
+    """
+    Random bytes with repeated runs, so that the data has references
+    (that may overlap) as well as literals.
+    """
+    rnd = random.Random(seed)
+    data = bytearray()
+    while len(data) < size:
+        if data and rnd.random() < 0.5:
+            start = rnd.randrange(len(data))
+            data += data[start:start + rnd.randint(1, 40)]
+        else:
+            data += bytes(rnd.randrange(256) for _ in range(rnd.randint(1, 20)))
+    return bytes(data[:size])
+#:
+
+def check_roundtrips(level: int):
+    ctx = pz.level_context(level)
+    for size in SIZES:
+        data = gen_binary(size, seed=size)
+        with io.BytesIO() as comp:
+            pz.encode(io.BytesIO(data), comp, None, ctx)
+            comp.seek(0)
+            header = pz.Header.read(comp)
+            assert header.original_size == size
+            with io.BytesIO() as out:
+                count = pz.decode(comp, out, [header.window_bits, header.len_bits])
+                assert out.getvalue() == data, f'{size} bytes: round trip differs'
+                assert count == size
+        assert pz.decompress(pz.compress(data, level)) == data
+    print(f'round trips OK ({len(SIZES)} sizes, level {level})')
+#:
+
+def time_decode(blob: bytes, write) -> float:
+    start = time.perf_counter()
+    with io.BytesIO(blob) as in_:
+        pz.decode_stream(in_, write, pz.Header.read(in_).context)
+    return time.perf_counter() - start
+#:
+
+def text_writer(out):
+    """
+    The old decode path: the bytes were decoded as UTF-8, without '\r',
+    and written to a text stream.
+    """
+    decoder = codecs.getincrementaldecoder(pz.ENCODING)()
+    def write_text(data):
+        out.write(decoder.decode(bytes(data).replace(b'\r', b'')))
+    return write_text
+#:
+
+def main():
+    size = int(float(sys.argv[1]) * 1024 * 1024) if len(sys.argv) > 1 else 2 * 1024 * 1024
+    level = int(sys.argv[2]) if len(sys.argv) > 2 else pz.DEFAULT_LEVEL
+    check_roundtrips(level)
+
+    data = generate('text', size)
+    blob = pz.compress(data, level)
+    mb = len(data) / (1024 * 1024)
+    with io.BytesIO() as out:
+        t_bin = time_decode(blob, out.write)
+        assert out.getvalue() == data
+    with io.StringIO() as out:
+        t_text = time_decode(blob, text_writer(out))
+    print(f'{"sink":>8} {"MB/s":>8}')
+    print(f'{"binary":>8} {mb / t_bin:>8.2f}')
+    print(f'{"text":>8} {mb / t_text:>8.2f}')
+#:
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Preset dictionaries on small payloads: JSON records and log lines of
+a few hundred bytes, compressed one by one. A dictionary is trained on
+some records and used for others (not in the training set). Reports
+the compression ratio and the time per message, with and without the
+dictionary.
+
+    Usage:
+        python bench/bench_dictionary.py [LEVEL] [DICT_SIZE]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import pzyp as pz
+
+NUM_TRAIN = 2000
+NUM_TEST = 500
+
+
+def gen_json(rnd: random.Random, i: int) -> bytes:
+    return json.dumps({
+        'id': i,
+        'user': rnd.choice(['alice', 'bob', 'carol', 'dave']),
+        'event': rnd.choice(['login', 'logout', 'purchase', 'refund']),
+        'amount': round(rnd.uniform(0, 1000), 2),
+        'timestamp': 1_700_000_000 + i * 7,
+        'tags': rnd.sample(['web', 'mobile', 'api', 'batch', 'eu', 'us'], 2),
+    }).encode()
+#:
+
+def gen_log(rnd: random.Random, i: int) -> bytes:
+    level = rnd.choice(['INFO', 'INFO', 'INFO', 'WARNING', 'ERROR'])
+    return (
+        f'2024-03-{1 + i % 28:02d} 12:{i % 60:02d}:{rnd.randrange(60):02d} {level} '
+        f'[worker-{rnd.randrange(8)}] request {rnd.getrandbits(32):08x} '
+        f'GET /api/v1/items/{rnd.randrange(10_000)} -> {rnd.choice([200, 200, 404, 500])} '
+        f'in {rnd.randrange(1, 900)} ms'
+    ).encode()
+#:
+
+def measure(messages, level: int, dictionary=None):
+    start = time.perf_counter()
+    blobs = [pz.compress(message, level, dictionary) for message in messages]
+    t_comp = time.perf_counter() - start
+    start = time.perf_counter()
+    for message, blob in zip(messages, blobs):
+        assert pz.decompress(blob, dictionary) == message
+    t_dec = time.perf_counter() - start
+    return sum(map(len, blobs)), t_comp, t_dec
+#:
+
+def main():
+    level = int(sys.argv[1]) if len(sys.argv) > 1 else pz.DEFAULT_LEVEL
+    dict_size = int(sys.argv[2]) if len(sys.argv) > 2 else 16 * 1024
+    print(f'{"corpus":>6} {"dict":>6} {"ratio":>6} {"comp µs":>8} {"dec µs":>8}')
+    for name, gen in (('json', gen_json), ('log', gen_log)):
+        rnd = random.Random(1234)
+        train = [gen(rnd, i) for i in range(NUM_TRAIN)]
+        test = [gen(rnd, NUM_TRAIN + i) for i in range(NUM_TEST)]
+        dictionary = pz.Dictionary(pz.train_dictionary(train, dict_size))
+        size = sum(map(len, test))
+        for label, used in (('none', None), (str(len(dictionary.data)), dictionary)):
+            comp_size, t_comp, t_dec = measure(test, level, used)
+            print(
+                f'{name:>6} {label:>6} {size / comp_size:>6.2f}'
+                f' {t_comp / NUM_TEST * 1e6:>8.0f} {t_dec / NUM_TEST * 1e6:>8.0f}'
+            )
+#:
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Compression speed (MB/s) and ratio for each compression LEVEL.
+
+    Usage:
+        python bench/bench_levels.py [FILE] [SIZE_IN_KB]
+
+Without FILE, the 'text' corpus of corpus.py is used, SIZE_IN_KB
+(default 1024) of it. Each level is run through the command line
+(pzyp.py -c -l LEVEL FILE), so times include interpreter startup.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from corpus import generate
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+PZYP = os.path.join(SRC_DIR, 'pzyp.py')
+LEVELS = range(1, 10)
+
+
+def run_level(file_path: str, level: int, work_dir: str):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, PZYP, '-c', '-l', str(level), file_path],
+        cwd=work_dir, check=True, stdout=subprocess.DEVNULL,
+    )
+    elapsed = time.perf_counter() - start
+    name = os.path.basename(file_path).split('.')[0]
+    out_path = os.path.join(work_dir, f'{name}.lzs')
+    comp_size = os.path.getsize(out_path)
+    os.remove(out_path)
+    return elapsed, comp_size
+#:
+
+def main():
+    size = int(sys.argv[2]) * 1024 if len(sys.argv) > 2 else 1024 * 1024
+    with tempfile.TemporaryDirectory() as work_dir:
+        if len(sys.argv) > 1 and sys.argv[1] != '-':
+            file_path = os.path.abspath(sys.argv[1])
+        else:
+            file_path = os.path.join(work_dir, 'bench_input.txt')
+            with open(file_path, 'wb') as f:
+                f.write(generate('text', size))
+        in_size = os.path.getsize(file_path)
+        print(f'input: {file_path} ({in_size} bytes)')
+        print(f'{"level":>5} {"seconds":>9} {"MB/s":>8} {"ratio":>7}')
+        for level in LEVELS:
+            elapsed, comp_size = run_level(file_path, level, work_dir)
+            print(
+                f'{level:>5} {elapsed:>9.2f} {in_size / elapsed / 1e6:>8.3f}'
+                f' {comp_size / in_size:>7.3f}'
+            )
+#:
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Peak memory (RSS) of a compression job for several input sizes. The
+input ('text' of corpus.py) is generated on disk in blocks, and
+pzyp.py -c runs in a child process whose address space is capped, so
+a job that tries to hold its whole input in memory fails instead of
+swapping. Inputs that fit under the cap are caught too: the peak RSS
+must not grow with the input, so a job whose peak is more than half
+the extra input above that of the smallest input is marked 'grows'.
+
+    Usage:
+        python bench/bench_memory.py [SIZE_IN_MB ...] [--cap=MB]
+
+Defaults to 1, 4 and 16 MB inputs with a 512 MB cap. Pass larger
+sizes (eg, 1024) for a full run; Unix only (uses 'resource').
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from corpus import generate, SEED
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+PZYP = os.path.join(SRC_DIR, 'pzyp.py')
+BLOCK = 1024 * 1024
+
+
+def gen_file(path: str, size: int, seed=SEED):
+    """
+    Writes C{size} bytes of the 'text' corpus to C{path}: one block of
+    it, repeated (the repeats are far beyond the compression window).
+    """
+    block = generate('text', BLOCK, seed)
+    with open(path, 'wb') as f:
+        for start in range(0, size, BLOCK):
+            f.write(block[:size - start])
+#:
+
+def run_capped(args, cwd, cap_bytes):
+    def limit_memory():
+        resource.setrlimit(resource.RLIMIT_AS, (cap_bytes, cap_bytes))
+    before = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    start = time.perf_counter()
+    proc = subprocess.run(args, cwd=cwd, preexec_fn=limit_memory, stdout=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss for children is the max over all children so far
+    return proc.returncode, elapsed, max(peak_kb, before)
+#:
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:] if not a.startswith('--')] or [1, 4, 16]
+    cap_mb = 512
+    for arg in sys.argv[1:]:
+        if arg.startswith('--cap='):
+            cap_mb = int(arg.partition('=')[2])
+    print(f'{"size MB":>8} {"seconds":>9} {"peak RSS MB":>12} {"status":>7}')
+    base = None     # (size MB, peak KB) of the smallest input
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size_mb in sorted(sizes):
+            in_path = os.path.join(work_dir, 'bench_input.log')
+            gen_file(in_path, size_mb * 1024 * 1024)
+            code, elapsed, peak_kb = run_capped(
+                [sys.executable, PZYP, '-c', in_path], work_dir, cap_mb * 1024 * 1024
+            )
+            os.remove(in_path)
+            base = base or (size_mb, peak_kb)
+            status = 'ok' if code == 0 else f'rc={code}'
+            if code == 0 and peak_kb - base[1] > (size_mb - base[0]) * 1024 / 2:
+                status = 'grows'
+            print(f'{size_mb:>8} {elapsed:>9.2f} {peak_kb / 1024:>12.1f} {status:>7}')
+#:
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Scaling of parallel compression and decompression (pzyp.py -c -j N,
+pzyp.py -d -j N) with the number of processes, on a generated
+text-like input.
+
+    Usage:
+        python bench/bench_parallel.py [SIZE_IN_MB] [MAX_JOBS]
+
+Defaults to a 16 MB input and up to one process per CPU. Jobs double
+from 1 up to MAX_JOBS; the speedup is relative to -j 1.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_memory import gen_file, PZYP
+
+
+def run_jobs(file_path: str, jobs: int, work_dir: str):
+    comp_path = os.path.join(work_dir, 'bench_input.lzs')
+    timings = []
+    for args in (['-c', file_path], ['-d', comp_path]):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, PZYP, *args, '-j', str(jobs)],
+            cwd=work_dir, check=True, stdout=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - start)
+    os.remove(comp_path)
+    return timings
+#:
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    max_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    jobs_list = []
+    jobs = 1
+    while jobs < max_jobs:
+        jobs_list.append(jobs)
+        jobs *= 2
+    jobs_list.append(max_jobs)
+
+    with tempfile.TemporaryDirectory() as in_dir, tempfile.TemporaryDirectory() as work_dir:
+        file_path = os.path.join(in_dir, 'bench_input.log')
+        gen_file(file_path, size_mb * 1024 * 1024)
+        print(f'input: {size_mb} MB, {os.cpu_count()} CPUs')
+        print(
+            f'{"jobs":>5} {"comp MB/s":>10} {"speedup":>8}'
+            f' {"decomp MB/s":>12} {"speedup":>8}'
+        )
+        base = None
+        for jobs in jobs_list:
+            comp_time, decomp_time = run_jobs(file_path, jobs, work_dir)
+            base = base or (comp_time, decomp_time)
+            print(
+                f'{jobs:>5} {size_mb / comp_time:>10.2f} {base[0] / comp_time:>7.2f}x'
+                f' {size_mb / decomp_time:>12.2f} {base[1] / decomp_time:>7.2f}x'
+            )
+#:
+
+if __name__ == '__main__':
+    main()
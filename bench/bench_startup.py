@@ -0,0 +1,100 @@
+"""
+Startup cost of pzyp: the modules loaded by 'import pzyp', as reported
+by 'python -X importtime', and the wall time of a small compression
+job from the command line. Fails (exit status 1) if importing pzyp
+takes longer than the budget or loads the GUI, crypto or argument
+parsing packages.
+
+    Usage:
+        python bench/bench_startup.py [BUDGET_MS] [RUNS]
+
+BUDGET_MS defaults to 100 (cumulative import time of pzyp); RUNS
+defaults to 10.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+PZYP = os.path.join(SRC_DIR, 'pzyp.py')
+FORBIDDEN = ('PySide6', 'cryptography', 'docopt', 'desktop_app1')
+
+
+def import_times():
+    """
+    Returns {module: cumulative microseconds} for 'import pzyp'.
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import pzyp'],
+        cwd=SRC_DIR, check=True, capture_output=True, text=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumul_us, name = line.split('|')
+        times[name.strip()] = int(cumul_us)
+    return times
+#:
+
+def loaded_modules():
+    proc = subprocess.run(
+        [sys.executable, '-c', 'import sys, pzyp; print(" ".join(sys.modules))'],
+        cwd=SRC_DIR, check=True, capture_output=True, text=True,
+    )
+    return set(proc.stdout.split())
+#:
+
+def cli_times(runs: int):
+    with tempfile.TemporaryDirectory() as work_dir:
+        in_path = os.path.join(work_dir, 'small.txt')
+        with open(in_path, 'wb') as f:
+            f.write(b'I am Sam\nSam I am\n' * 20)
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, PZYP, '-c', in_path],
+                cwd=work_dir, check=True, stdout=subprocess.DEVNULL,
+            )
+            times.append(time.perf_counter() - start)
+            os.remove(os.path.join(work_dir, 'small.lzs'))
+    return times
+#:
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    times = import_times()
+    print('heaviest imports (cumulative ms):')
+    for name, cumul_us in sorted(times.items(), key=lambda item: -item[1])[:10]:
+        print(f'  {cumul_us / 1000:>8.1f}  {name}')
+    import_ms = times['pzyp'] / 1000
+
+    forbidden = sorted(
+        name for name in loaded_modules()
+        if name.split('.')[0] in FORBIDDEN
+    )
+    cli = cli_times(runs)
+    print(f'import pzyp: {import_ms:.1f} ms (budget {budget_ms:.0f} ms)')
+    print(
+        f'pzyp.py -c (small file): median {statistics.median(cli) * 1000:.1f} ms,'
+        f' min {min(cli) * 1000:.1f} ms over {runs} runs'
+    )
+    failed = False
+    if forbidden:
+        print(f'FAIL: import pzyp loads {", ".join(forbidden)}')
+        failed = True
+    if import_ms > budget_ms:
+        print('FAIL: import pzyp is over budget')
+        failed = True
+    sys.exit(1 if failed else 0)
+#:
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+Benchmark suite: every compression LEVEL on the deterministic corpora
+of corpus.py, in several sizes. For each case it reports compression
+and decompression speed (MB/s of original data), the ratio, the peak
+RSS, the token statistics of pzyp.Stats, and the speed of LZSSReader
+and LZSSWriter alone on the same tokens (MB/s of compressed data).
+Each case runs in a new process, so its peak RSS is its own.
+
+The report is a JSON file. Given a previous report as baseline, the
+cases are compared and any regression (a slower speed or more memory,
+beyond the tolerance, or a bigger compressed size) is printed and the
+exit status is 1. Speeds only compare on the same machine: make the
+baseline there first (eg, with -o baseline.json). Run it as
+'python bench/bench_suite.py [options]'.
+
+    Usage:
+        bench_suite.py [options]
+
+    Options:
+        -o, --output=FILE       write the report to FILE [default: bench_report.json]
+        -b, --baseline=FILE     compare the results with the report in FILE
+        --sizes=KB              corpus sizes in KB, comma separated [default: 64,256]
+        --levels=LEVELS         levels, comma separated [default: 1,2,3,4,5,6,7,8,9]
+        --corpora=NAMES         corpora, comma separated [default: text,logs,json,binary,repetitive]
+        --repeat=N              runs of each case, the fastest one counts [default: 1]
+        --tolerance=FRACTION    slowdown or memory growth allowed [default: 0.15]
+"""
+
+import io
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import lzss_io as lz
+import pzyp as pz
+from corpus import generate
+
+SPEEDS = ['compress_mb_s', 'decompress_mb_s', 'reader_mb_s', 'writer_mb_s']
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:     # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+#:
+
+def best_time(func, repeat: int):
+    """
+    Runs C{func} C{repeat} times. Returns the shortest time and the
+    result of the last run.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+#:
+
+def run_case(corpus: str, size: int, level: int, repeat: int) -> dict:
+    data = generate(corpus, size)
+    ctx = pz.level_context(level)
+    mb = size / 2**20
+
+    def compress():
+        stats = pz.Stats()
+        with io.BytesIO() as out:
+            pz.encode(io.BytesIO(data), out, None, ctx, stats=stats)
+            return out.getvalue(), stats
+    t_comp, (blob, comp_stats) = best_time(compress, repeat)
+
+    in_ = io.BytesIO(blob)
+    header = pz.Header.read(in_)
+    stream = blob[in_.tell():]
+
+    def decompress():
+        result = bytearray()
+        pz.decode_stream(io.BytesIO(stream), result.extend, header.context, header)
+        return result
+    t_dec, result = best_time(decompress, repeat)
+    assert result == data, f'{corpus}/{size}/{level}: round trip differs'
+
+    def read_tokens():
+        with lz.LZSSReader(io.BytesIO(stream), ctx) as lzss_in:
+            return [element for _, element in lzss_in]
+    t_read, tokens = best_time(read_tokens, repeat)
+
+    def write_tokens():
+        with io.BytesIO() as out:
+            with lz.LZSSWriter(out, ctx) as lzss_out:
+                lzss_out.write_many(tokens)
+            return out.getvalue()
+    t_write, written = best_time(write_tokens, repeat)
+    assert written == stream, f'{corpus}/{size}/{level}: tokens written differ'
+
+    summary = comp_stats.summary()
+    stream_mb = len(stream) / 2**20
+    return {
+        'corpus': corpus,
+        'size': size,
+        'level': level,
+        'compressed_size': len(blob),
+        'ratio': round(size / len(blob), 4),
+        'compress_mb_s': round(mb / t_comp, 4),
+        'decompress_mb_s': round(mb / t_dec, 4),
+        'reader_mb_s': round(stream_mb / t_read, 4) if t_read else None,
+        'writer_mb_s': round(stream_mb / t_write, 4) if t_write else None,
+        'peak_rss_kb': peak_rss_kb(),
+        'literals': summary['literals'],
+        'references': summary['references'],
+        'match_lengths': summary['match_lengths'],
+        'average_search_depth': summary['average_search_depth'],
+        'match_finding_s': summary['match_finding_s'],
+        'bit_io_s': summary['bit_io_s'],
+    }
+#:
+
+def case_key(case: dict) -> str:
+    return f"{case['corpus']}/{case['size'] // 1024}K/level {case['level']}"
+#:
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """
+    Returns a message for each regression of C{results} with respect
+    to the cases with the same key in C{baseline}.
+    """
+    old_cases = {case_key(case): case for case in baseline}
+    regressions = []
+    for case in results:
+        key = case_key(case)
+        old = old_cases.get(key)
+        if old is None:
+            continue
+        if case['compressed_size'] > old['compressed_size']:
+            regressions.append(
+                f"{key}: compressed size {old['compressed_size']} -> {case['compressed_size']}"
+            )
+        for metric in SPEEDS:
+            if case[metric] and old[metric] and case[metric] < old[metric] * (1 - tolerance):
+                regressions.append(f'{key}: {metric} {old[metric]} -> {case[metric]}')
+        if case['peak_rss_kb'] and old['peak_rss_kb'] and (
+                case['peak_rss_kb'] > old['peak_rss_kb'] * (1 + tolerance)):
+            regressions.append(f"{key}: peak_rss_kb {old['peak_rss_kb']} -> {case['peak_rss_kb']}")
+    return regressions
+#:
+
+def main():
+    from docopt import docopt
+    args = docopt(__doc__)
+    sizes = [int(size) * 1024 for size in args['--sizes'].split(',')]
+    levels = [int(level) for level in args['--levels'].split(',')]
+    corpora = args['--corpora'].split(',')
+    repeat = int(args['--repeat'])
+
+    results = []
+    print(f'{"case":>28} {"ratio":>6} {"comp":>7} {"dec":>7} {"read":>7} {"write":>7} {"RSS MB":>7}')
+    # a new process for each case, so that its peak RSS is its own
+    context = multiprocessing.get_context('spawn')
+    for corpus in corpora:
+        for size in sizes:
+            for level in levels:
+                with ProcessPoolExecutor(1, mp_context=context) as pool:
+                    case = pool.submit(run_case, corpus, size, level, repeat).result()
+                results.append(case)
+                rss = case['peak_rss_kb'] / 1024 if case['peak_rss_kb'] else float('nan')
+                print(
+                    f'{case_key(case):>28} {case["ratio"]:>6.2f} {case["compress_mb_s"]:>7.3f}'
+                    f' {case["decompress_mb_s"]:>7.3f} {case["reader_mb_s"]:>7.3f}'
+                    f' {case["writer_mb_s"]:>7.3f} {rss:>7.1f}'
+                )
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    with open(args['--output'], 'w') as out:
+        json.dump(report, out, indent=2)
+    print(f"Report written to {args['--output']}")
+
+    if args['--baseline']:
+        with open(args['--baseline']) as in_:
+            baseline = json.load(in_)
+        regressions = compare(results, baseline['results'], float(args['--tolerance']))
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args['--baseline']}")
+#:
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Micro-benchmark of LZSSWriter: tokens/s with one write() per token
+versus one write_many() per batch of tokens. Also checks that both
+produce exactly the same bytes.
+
+    Usage:
+        python bench/bench_writer.py [NUM_TOKENS] [BATCH_SIZE]
+"""
+
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import lzss_io as lz
+
+CONTEXTS = {
+    '10/4': lz.PZYPContext(encoded_offset_size=10, encoded_len_size=4),
+    '12/4': lz.PZYPContext(encoded_offset_size=12, encoded_len_size=4),
+    '15/5': lz.PZYPContext(encoded_offset_size=15, encoded_len_size=5),
+}
+
+
+def gen_tokens(ctx, count: int, seed=1234):
+    rnd = random.Random(seed)
+    return [
+        bytes((rnd.randrange(256),)) if rnd.random() < 0.5 else
+        (rnd.randrange(1, ctx.window_size), rnd.randint(ctx.min_string_size, ctx.max_string_size))
+        for _ in range(count)
+    ]
+#:
+
+def time_write(ctx, tokens):
+    out = io.BytesIO()
+    start = time.perf_counter()
+    with lz.LZSSWriter(out, ctx) as writer:
+        for token in tokens:
+            writer.write(token)
+    return time.perf_counter() - start, out.getvalue()
+#:
+
+def time_write_many(ctx, tokens, batch_size):
+    out = io.BytesIO()
+    start = time.perf_counter()
+    with lz.LZSSWriter(out, ctx) as writer:
+        for i in range(0, len(tokens), batch_size):
+            writer.write_many(tokens[i:i + batch_size])
+    return time.perf_counter() - start, out.getvalue()
+#:
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    print(f'{"format":>6} {"write tok/s":>12} {"write_many tok/s":>17} {"speedup":>8}')
+    for name, ctx in CONTEXTS.items():
+        tokens = gen_tokens(ctx, count)
+        t_write, out_write = time_write(ctx, tokens)
+        t_many, out_many = time_write_many(ctx, tokens, batch_size)
+        assert out_write == out_many, 'write_many output differs from write'
+        print(
+            f'{name:>6} {count / t_write:>12,.0f} {count / t_many:>17,.0f}'
+            f' {t_write / t_many:>7.1f}x'
+        )
+#:
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Deterministic corpora for the benchmarks, generated offline from a
+fixed seed: the same name, size and seed always give the same bytes,
+on any machine, so results can be compared between runs.
+
+    text        words and sentences (natural-language-like)
+    logs        application log lines with timestamps and ids
+    json        one JSON record per line
+    binary      random bytes (incompressible)
+    repetitive  a short pattern repeated, with rare changes
+
+    Usage:
+        python bench/corpus.py NAME SIZE_IN_KB OUT_FILE
+"""
+
+import json
+import random
+import sys
+
+SEED = 1234
+
+
+def gen_text(size: int, seed=SEED) -> bytes:
+    rnd = random.Random(seed)
+    words = [
+        bytes(rnd.choice(b'abcdefghijklmnopqrstuvwxyz') for _ in range(rnd.randint(2, 10)))
+        for _ in range(2000)
+    ]
+    out = bytearray()
+    while len(out) < size:
+        sentence = b' '.join(rnd.choices(words, k=rnd.randint(5, 15)))
+        out += sentence[:1].upper() + sentence[1:] + b'.\n'
+    return bytes(out[:size])
+#:
+
+def gen_logs(size: int, seed=SEED) -> bytes:
+    rnd = random.Random(seed)
+    levels = ['INFO'] * 6 + ['DEBUG'] * 3 + ['WARNING', 'ERROR']
+    paths = ['/api/v1/items', '/api/v1/users', '/login', '/static/app.js', '/health']
+    out = bytearray()
+    i = 0
+    while len(out) < size:
+        out += (
+            f'2024-03-{1 + i // 86_400 % 28:02d} {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}'
+            f' {rnd.choice(levels)} [worker-{rnd.randrange(8)}] req={rnd.getrandbits(32):08x}'
+            f' {rnd.choice(["GET", "GET", "POST"])} {rnd.choice(paths)}/{rnd.randrange(10_000)}'
+            f' status={rnd.choice([200, 200, 200, 304, 404, 500])} time={rnd.randrange(1, 900)}ms\n'
+        ).encode()
+        i += rnd.randint(0, 3)
+    return bytes(out[:size])
+#:
+
+def gen_json(size: int, seed=SEED) -> bytes:
+    rnd = random.Random(seed)
+    out = bytearray()
+    i = 0
+    while len(out) < size:
+        out += json.dumps({
+            'id': i,
+            'user': f'user{rnd.randrange(500)}',
+            'event': rnd.choice(['login', 'logout', 'purchase', 'refund', 'view']),
+            'amount': round(rnd.uniform(0, 1000), 2),
+            'timestamp': 1_700_000_000 + i * 7,
+            'tags': rnd.sample(['web', 'mobile', 'api', 'batch', 'eu', 'us'], 2),
+        }).encode() + b'\n'
+        i += 1
+    return bytes(out[:size])
+#:
+
+def gen_binary(size: int, seed=SEED) -> bytes:
+    return random.Random(seed).randbytes(size)
+#:
+
+def gen_repetitive(size: int, seed=SEED) -> bytes:
+    rnd = random.Random(seed)
+    pattern = bytearray(b'pzyp LZSS window ' * 4)
+    out = bytearray()
+    while len(out) < size:
+        if rnd.random() < 0.01:
+            pattern[rnd.randrange(len(pattern))] = rnd.randrange(32, 127)
+        out += pattern
+    return bytes(out[:size])
+#:
+
+CORPORA = {
+    'text': gen_text,
+    'logs': gen_logs,
+    'json': gen_json,
+    'binary': gen_binary,
+    'repetitive': gen_repetitive,
+}
+
+def generate(name: str, size: int, seed=SEED) -> bytes:
+    return CORPORA[name](size, seed)
+#:
+
+if __name__ == '__main__':
+    name, size_kb, out_path = sys.argv[1:4]
+    with open(out_path, 'wb') as out:
+        out.write(generate(name, int(size_kb) * 1024))
@@ -2,14 +2,17 @@
 import pathlib
 import sys
 import os
+import time
 
 
-from PySide6.QtCore import QSize, Qt
-from PySide6.QtWidgets import QApplication, QMainWindow, QFileDialog, QMessageBox, QDialogButtonBox
+from PySide6.QtCore import QObject, QRect, QRunnable, QSize, Qt, QThreadPool, Signal
+from PySide6.QtWidgets import (
+    QApplication, QMainWindow, QFileDialog, QMessageBox, QDialogButtonBox,
+    QHBoxLayout, QLabel, QProgressBar, QPushButton, QScrollArea, QVBoxLayout, QWidget,
+)
 from PySide6.QtGui import QIcon
 import ui_desktop_app
 import pzyp as pz
-import lzss_io as lz
 from utils import (
     compile_ui_if_needed, 
     connectev, 
@@ -26,9 +29,112 @@ __all__ = [
     'PzypMainWindow',
 ]
 
-LEVEL = {1: (10, 4), 2: (12, 4), 3: (14, 5), 4: (15, 5)}
 DEFAULT_EXT = 'lzs'
 FILE_NAME = ''
+PATH_SEP = ';'              # between the files selected in the dialog
+REPORT_INTERVAL = 0.1       # seconds between progress updates of a job
+
+
+class JobSignals(QObject):
+    """
+    Signals of a C{Job}. They are emitted from its worker thread and
+    delivered in the GUI thread.
+    """
+    progress = Signal(object)   # pz.Progress
+    finished = Signal(str)      # message for the user
+    failed = Signal(str)        # error message
+    cancelled = Signal()
+
+class Job(QRunnable):
+    """
+    Runs C{func(progress)} in a thread of a C{QThreadPool}, where
+    C{progress} is a C{pz.Progress} of C{total} bytes that C{func}
+    passes to the codec. C{func} returns the message shown when it's
+    done. Cancelling C{progress} stops the codec between blocks.
+    """
+    def __init__(self, func, total: int):
+        super().__init__()
+        self.signals = JobSignals()
+        self.progress = pz.Progress(total, self._report)
+        self._func = func
+        self._last_report = 0.0
+
+    def run(self):
+        try:
+            message = self._func(self.progress)
+        except pz.Cancelled:
+            self.signals.cancelled.emit()
+        except Exception as ex:
+            self.signals.failed.emit(str(ex))
+        else:
+            self.signals.finished.emit(message)
+
+    def _report(self, progress):
+        now = time.perf_counter()
+        if now - self._last_report >= REPORT_INTERVAL:
+            self._last_report = now
+            self.signals.progress.emit(progress)
+#:
+
+class JobWidget(QWidget):
+    """
+    A row of the jobs panel: file name, progress bar, MB/s and ETA, and
+    a button to cancel the job.
+    """
+    def __init__(self, job: Job, title: str, parent=None):
+        super().__init__(parent)
+        self.lblTitle = QLabel(title)
+        self.progressBar = QProgressBar()
+        # with no total the bar just shows that the job is running
+        self.progressBar.setRange(0, 100 if job.progress.total else 0)
+        self.lblStatus = QLabel('Waiting')
+        self.btnCancel = QPushButton('Cancel')
+        self.btnCancel.clicked.connect(job.progress.cancel)
+        row = QHBoxLayout()
+        row.addWidget(self.progressBar)
+        row.addWidget(self.btnCancel)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.lblTitle)
+        layout.addLayout(row)
+        layout.addWidget(self.lblStatus)
+        job.signals.progress.connect(self.show_progress)
+        job.signals.finished.connect(lambda _: self.end('Done'))
+        job.signals.failed.connect(lambda _: self.end('Failed'))
+        job.signals.cancelled.connect(lambda: self.end('Cancelled'))
+
+    def show_progress(self, progress):
+        if progress.total:
+            self.progressBar.setValue(min(100 * progress.done // progress.total, 100))
+        status = f'{progress.throughput / 2**20:.2f} MB/s'
+        if (eta := progress.eta) is not None:
+            status += f', ETA {int(eta) // 60}:{int(eta) % 60:02d}'
+        self.lblStatus.setText(status)
+
+    def end(self, status: str):
+        self.progressBar.setRange(0, 100)
+        self.progressBar.setValue(100 if status == 'Done' else self.progressBar.value())
+        self.lblStatus.setText(status)
+        self.btnCancel.setEnabled(False)
+#:
+
+def compress_job(in_path: str, out_path: str, ctx, password):
+    def run(progress):
+        try:
+            pz.encode(in_path, out_path, None, ctx, password, progress=progress)
+        except pz.Cancelled:
+            os.remove(out_path)
+            raise
+        return f"Compressed {in_path} into {out_path}"
+    return Job(run, os.path.getsize(in_path))
+#:
+
+def decompress_job(in_path: str, out_path: str, header, password):
+    def run(progress):
+        # a cancelled or failed job leaves no output (nor overwrites one)
+        pz.decode_file(in_path, out_path, password, progress=progress)
+        return f"Decompressed {in_path} into {out_path}"
+    return Job(run, header.original_size if header.size_known else 0)
+#:
 
 
 class PzypMainWindow(QMainWindow, ui_desktop_app.Ui_MainWindow):
@@ -44,6 +150,23 @@ class PzypMainWindow(QMainWindow, ui_desktop_app.Ui_MainWindow):
         self.btnStart.clicked.connect(self.start_compression)
         self.btnStart.setEnabled(False)
         self.comboBox.setEnabled(False)
+        self.setup_jobs_panel()
+        self.pool = QThreadPool.globalInstance()
+        self.jobs = []
+
+    def setup_jobs_panel(self):
+        """
+        A scrollable list of the jobs below the controls, one
+        C{JobWidget} for each.
+        """
+        self.resize(self.width(), self.height() + 200)
+        self.jobsArea = QScrollArea(self.centralwidget)
+        self.jobsArea.setGeometry(QRect(20, 400, 350, 220))
+        self.jobsArea.setWidgetResizable(True)
+        self.jobsPanel = QWidget()
+        self.jobsLayout = QVBoxLayout(self.jobsPanel)
+        self.jobsLayout.setAlignment(Qt.AlignTop)
+        self.jobsArea.setWidget(self.jobsPanel)
 
     def browse_and_select(self, *_):
         
@@ -55,7 +178,8 @@ class PzypMainWindow(QMainWindow, ui_desktop_app.Ui_MainWindow):
         file_dialog.setAcceptDrops(True)
         file_dialog.setFileMode(QFileDialog.ExistingFile)
         file_dialog.setDirectory(get_standard_location('home'))
-        file_path, *_ = file_dialog.getOpenFileName()
+        file_paths, *_ = file_dialog.getOpenFileNames()
+        file_path = f'{PATH_SEP} '.join(file_paths)
         if self.radioButtonC.isChecked():
                 self.comboBox.setEnabled(True)
                 if file_path.strip():
@@ -83,50 +207,75 @@ class PzypMainWindow(QMainWindow, ui_desktop_app.Ui_MainWindow):
             
 
     def start_compression(self):
+        """
+        Queues a job for each selected file. The jobs run in the thread
+        pool, so the window stays responsive and several files are
+        processed at once.
+        """
+        in_file_paths = [path.strip() for path in self.txtFile.text().split(PATH_SEP) if path.strip()]
 
-        in_file_path = self.txtFile.text().strip()
-        out_file_path =  gen_unique_path_from(in_file_path)
-        fils=pz.filePathFromUI(in_file_path, out_file_path)
-
-        assert in_file_path, "File path is empty"
+        assert in_file_paths, "File path is empty"
 
-        if not os.path.exists(in_file_path):
-            show_error(f"File '{in_file_path}' not found")
-            return
+        for in_file_path in in_file_paths:
+            if not os.path.exists(in_file_path):
+                show_error(f"File '{in_file_path}' not found")
+                return
 
-        if not os.path.isfile(in_file_path):
-            show_error(f"This program doesn't work on directories!")
-            return
+            if not os.path.isfile(in_file_path):
+                show_error(f"This program doesn't work on directories!")
+                return
 
+        password = self.pwdtxt1.text().strip() or None
         if self.radioButtonC.isChecked():
             
             compressionLevel = int(self.comboBox.currentText()) if self.comboBox.currentIndex()!=0 else 2
             
-            off_len = LEVEL[compressionLevel]
-            off=off_len[0]
-            leng=off_len[1]
-            ctx=lz.PZYPContext(encoded_offset_size=off, encoded_len_size=leng)
-
-            out_file_path =  gen_unique_path_from(in_file_path)
-            fils=pz.filePathFromUI(in_file_path, out_file_path)
-
-            pz.encode(fils[0], fils[1], None ,ctx)
-            show_info(
-                f"Compressed {in_file_path} into {fils[1]}")
-            password = self.pwdtxt1.text().strip()
-            if password:
-                pz.genwrite_key(in_file_path, password)
-            pass
+            ctx = pz.level_context(compressionLevel)
+
+            # the jobs run at once: each one needs its own output file
+            out_file_paths = set()
+            for in_file_path in in_file_paths:
+                out_file_path = gen_unique_path_from(
+                    f'{os.path.splitext(in_file_path)[0]}.{DEFAULT_EXT}', out_file_paths,
+                )
+                out_file_paths.add(out_file_path)
+                self.start_job(compress_job(in_file_path, out_file_path, ctx, password), in_file_path)
         if self.radioButtonD.isChecked():
-            assert DEFAULT_EXT in in_file_path, show_error("File is not compressed! Try again.")
-            with open(in_file_path, 'rb') as f:
-                head=f.readline().split()
-                fileName = head[3].decode('utf8')
-                off_len =[int(head[0]), int(head[1])]
-                with open(fileName, 'w+') as out:
-                    pz.decode(f, out, off_len)
-            show_info(f"Decompressed {out_file_path} into {in_file_path}")
-            pass
+            for in_file_path in in_file_paths:
+                if DEFAULT_EXT not in in_file_path:
+                    show_error(f"{in_file_path} is not compressed! Try again.")
+                    return
+            headers = []
+            for in_file_path in in_file_paths:
+                with open(in_file_path, 'rb') as f:
+                    header = pz.Header.read(f)
+                if header.encrypted and not password:
+                    show_error(f"{in_file_path} is encrypted. Please enter its password.")
+                    return
+                headers.append(header)
+            out_file_paths = [os.path.abspath(header.name) for header in headers]
+            if len(set(out_file_paths)) < len(out_file_paths):
+                show_error("Some of the files decompress to the same file. Select them one at a time.")
+                return
+            for in_file_path, header in zip(in_file_paths, headers):
+                self.start_job(decompress_job(in_file_path, header.name, header, password), in_file_path)
+
+    def start_job(self, job: Job, title: str):
+        job.setAutoDelete(False)
+        self.jobsLayout.addWidget(JobWidget(job, os.path.basename(title)))
+        job.signals.finished.connect(self.statusbar.showMessage)
+        job.signals.failed.connect(show_error)
+        job.signals.finished.connect(lambda _: self.jobs.remove(job))
+        job.signals.failed.connect(lambda _: self.jobs.remove(job))
+        job.signals.cancelled.connect(lambda: self.jobs.remove(job))
+        self.jobs.append(job)
+        self.pool.start(job)
+
+    def closeEvent(self, event):
+        for job in self.jobs:
+            job.progress.cancel()
+        self.pool.waitForDone()
+        super().closeEvent(event)
 
 
     def checkpasswords(self, *_):
@@ -1,10 +1,9 @@
 import io
-import math
-from typing import Union, BinaryIO, Tuple
-# podem também querer: from typing import Iterable
+from typing import Union, BinaryIO, Tuple, Iterable
 
 import bitstruct
 from bitarray import bitarray
+from bitarray.util import ba2int, int2ba
 
 
 UNENCODED_STRING_SIZE = 8   # in bits
@@ -17,6 +16,23 @@ BREAK_EVEN_POINT = ENCODED_STRING_SIZE // 8   # in bytes
 MIN_STRING_SIZE = BREAK_EVEN_POINT + 1        # in bytes
 MAX_STRING_SIZE = 2 ** ENCODED_LEN_SIZE - 1  + MIN_STRING_SIZE  # in bytes
 
+MAX_CHAIN = 16      # max. candidates visited by the match finder
+
+# Parsing strategies (how the compressor chooses between matches)
+GREEDY = 'greedy'       # always take the longest match
+LAZY = 'lazy'           # ... unless the next position has a longer one
+OPTIMAL = 'optimal'     # minimum number of bits, given the token sizes
+
+HIGH_WATER_MARK = 32_768        # in bits
+
+READ_BUFFER_SIZE = 64 * 1024    # in bytes
+
+_PACK_BITS = 4096       # bits packed in an int before moving them to bytes
+_READ_PADDING = bytes(8)
+_BYTES = [bytes((i,)) for i in range(256)]
+_OBSERVER_BATCH = 4096  # tokens read before they're given to the observer
+_RUN_CHUNK = 64         # literals of a LiteralRun spread at a time
+
 
 class PZYPContext:
     """
@@ -30,13 +46,20 @@ class PZYPContext:
             encoded_offset_size=ENCODED_OFFSET_SIZE,
             encoded_len_size=ENCODED_LEN_SIZE,
             unenc_string_size=UNENCODED_STRING_SIZE,
+            max_chain=MAX_CHAIN,
+            strategy=GREEDY,
     ):
         """
-        These sizes are specified in bits.
+        These sizes are specified in bits. C{max_chain} is the maximum
+        number of previous positions the match finder will look at
+        before settling for the longest match found so far, and
+        C{strategy} is one of C{GREEDY}, C{LAZY} or C{OPTIMAL}.
         """
         self._encoded_offset_size = encoded_offset_size
         self._encoded_len_size = encoded_len_size
         self._unencoded_string_size = unenc_string_size
+        self._max_chain = max_chain
+        self._strategy = strategy
     #:
     @property
     def encoded_offset_size(self):
@@ -51,6 +74,14 @@ class PZYPContext:
         return self._unencoded_string_size
     #:
     @property
+    def max_chain(self):
+        return self._max_chain
+    #:
+    @property
+    def strategy(self):
+        return self._strategy
+    #:
+    @property
     def encoded_string_size(self) -> int:
         return self.encoded_offset_size + self.encoded_len_size  # in bits
     #:
@@ -72,6 +103,71 @@ class PZYPContext:
     #:
 #:
 
+class LiteralRun(bytes):
+    """
+    Several unencoded strings of one byte each (a run of literals),
+    given to C{LZSSWriter.write_many} as a single token. They are
+    written exactly as if each byte was a token of its own, but packed
+    C{_RUN_CHUNK} bytes at a time with a few integer operations instead
+    of a loop per byte. Only for 8-bit unencoded strings.
+    """
+#:
+
+def _spread_masks(num_bytes: int) -> list:
+    """
+    The C{(mask, shift)} steps that move byte i (counted from the
+    least significant one) of an integer from bit 8*i to bit 9*i, ie,
+    that put a 0 bit (the unencoded flag) before each byte. Byte i
+    moves i bits, in steps of the powers of 2 of i, from the highest:
+    bytes never overlap since their shifts only grow with i.
+    """
+    steps = []
+    for bit in reversed(range(max(num_bytes - 1, 0).bit_length())):
+        shift = 1 << bit
+        done = ~((shift << 1) - 1)      # higher bits of i, already moved
+        mask = 0
+        for i in range(num_bytes):
+            if i & shift:
+                mask |= 0xFF << (8 * i + (i & done))
+        steps.append((mask, shift))
+    return steps
+#:
+
+_SPREAD_STEPS = [_spread_masks(n) for n in range(_RUN_CHUNK + 1)]
+
+def _spread_literals(data: bytes) -> int:
+    """
+    The bits of C{data} as a run of literals (each byte preceded by a
+    0 flag), as an integer of 9 * len(data) bits.
+    """
+    value = int.from_bytes(data, 'big')
+    for mask, shift in _SPREAD_STEPS[len(data)]:
+        moved = value & mask
+        value = (value ^ moved) | (moved << shift)
+    return value
+#:
+
+class LZSSObserver:
+    """
+    Base class for the observers of an C{LZSSWriter} or C{LZSSReader}
+    (their C{observer} argument). C{tokens} receives the tokens written
+    or read, in batches, as C{bytes} (unencoded strings, or a
+    C{LiteralRun}) or C{(offset, length)} pairs; C{bytes_written} and
+    C{bytes_read} receive the number of bytes that went to, or came
+    from, the stream. Without an
+    observer, readers and writers don't count anything.
+    """
+    def tokens(self, tokens: Iterable[Union[bytes, Tuple[int, int]]]):
+        pass
+    #:
+    def bytes_written(self, size: int):
+        pass
+    #:
+    def bytes_read(self, size: int):
+        pass
+    #:
+#:
+
 class LZSSWriter:
     """
     An LZSSWriter object writes encoded or unencoded strings to an
@@ -85,8 +181,18 @@ class LZSSWriter:
             out: BinaryIO, 
             ctx=PZYPContext(),
             close_out_stream=False,
+            high_water_mark=HIGH_WATER_MARK,
+            observer=None,
     ):
+        """
+        Once the buffer holds at least C{high_water_mark} bits, all its
+        whole bytes are written to C{out}. Only the last incomplete
+        byte, if any, stays in the buffer. C{observer} is an
+        C{LZSSObserver}.
+        """
         self.buffer = bitarray()
+        self._observer = observer
+        self._high_water_mark = high_water_mark
         self._close_out_stream = close_out_stream
         self._out = out
         self._ctx = ctx
@@ -98,9 +204,74 @@ class LZSSWriter:
             self._inner_bitify_enc = self._bitify_enc_multiple_of_8
     #:
     def write(self, data: Union[bytes, Tuple[int, int]]):
+        if type(data) is LiteralRun:
+            self.write_many((data,))
+            return
+        if self._observer:
+            self._observer.tokens((data,))
         (self._bitify_unenc if isinstance(data, bytes) else self._bitify_enc)(data)
-        if len(self.buffer) == 32_768:
-            self._stream_bits()
+        if len(self.buffer) >= self._high_water_mark:
+            self._stream_bits(len(self.buffer) & ~7)
+    #:
+    def write_many(self, tokens: Iterable[Union[bytes, Tuple[int, int]]]):
+        """
+        Writes a sequence of encoded and unencoded strings, the same as
+        calling C{write} for each one, but packing them all in one pass.
+        The bits are accumulated in an C{int} and moved to a C{bytearray}
+        a few hundred bytes at a time. Only the last partial byte goes
+        through the C{bitarray}.
+        """
+        if self._observer:
+            tokens = list(tokens)
+            self._observer.tokens(tokens)
+        ctx = self._ctx
+        window_size = ctx.window_size
+        min_len, max_len = ctx.min_string_size, ctx.max_string_size
+        len_size = ctx.encoded_len_size
+        enc_bits = 1 + ctx.encoded_string_size
+        enc_flag = 1 << ctx.encoded_string_size
+        unenc_bits = 1 + ctx.unencoded_string_size
+
+        # start from the bits of an incomplete last byte in the buffer
+        num_bits = len(self.buffer) % 8
+        acc = ba2int(self.buffer[-num_bits:]) if num_bits else 0
+        if num_bits:
+            del self.buffer[-num_bits:]
+        packed = bytearray()
+        for data in tokens:
+            if isinstance(data, bytes):
+                assert data
+                if len(data) == 1:
+                    acc = acc << unenc_bits | data[0]
+                    num_bits += unenc_bits
+                elif type(data) is LiteralRun:
+                    assert unenc_bits == 9
+                    for i in range(0, len(data), _RUN_CHUNK):
+                        chunk = data[i:i + _RUN_CHUNK]
+                        acc = acc << (9 * len(chunk)) | _spread_literals(chunk)
+                        num_bits += 9 * len(chunk)
+                else:
+                    acc = acc << (1 + 8 * len(data)) | int.from_bytes(data, 'big')
+                    num_bits += 1 + 8 * len(data)
+            else:
+                pos, len_ = data
+                assert pos < window_size, f'pos={pos}'
+                assert min_len <= len_ <= max_len, f'pos = {pos}, len = {len_}'
+                acc = acc << enc_bits | enc_flag | pos << len_size | (len_ - min_len)
+                num_bits += enc_bits
+            if num_bits >= _PACK_BITS:
+                rest = num_bits & 7
+                packed += (acc >> rest).to_bytes(num_bits >> 3, 'big')
+                acc &= (1 << rest) - 1
+                num_bits = rest
+        rest = num_bits & 7
+        if num_bits >> 3:
+            packed += (acc >> rest).to_bytes(num_bits >> 3, 'big')
+        self.buffer.frombytes(bytes(packed))
+        if rest:
+            self.buffer.extend(int2ba(acc & ((1 << rest) - 1), rest))
+        if len(self.buffer) >= self._high_water_mark:
+            self._stream_bits(len(self.buffer) & ~7)
     #:
     def _bitify_enc(self, enc_data: Tuple[int, int]) -> int:
         pos, len_ = enc_data
@@ -131,6 +302,8 @@ class LZSSWriter:
         data = self.buffer[:size_in_bits].tobytes()
         del self.buffer[:size_in_bits]
         self._out.write(data)
+        if self._observer:
+            self._observer.bytes_written(len(data))
     #:
     def close(self, flush_buffer=True):
         if flush_buffer:
@@ -157,81 +330,161 @@ class LZSSReader:
     A LZSS decoder can use this class to create an object that parses
     reads the 'in_' stream in termos of encoded or unencoded string,
     accordingly to the classic LZSS specification.
+
+    The 'in_' stream is read in blocks of C{buffer_size} bytes and the
+    tokens are parsed straight from that block, so there's no need for
+    C{tell}/C{seek} and non-seekable streams (pipes, sockets) also
+    work. The end of the data is only checked when a block runs out.
     """
     def __init__(
             self, 
             in_: BinaryIO, 
             ctx=PZYPContext(),
             close_in_stream=False,
+            buffer_size=READ_BUFFER_SIZE,
+            skip_bits=0,
+            observer=None,
     ):
-        self.buffer = bitarray()
+        """
+        C{skip_bits} (0 to 7) is the number of bits to ignore in the
+        first byte, for a stream that doesn't start at a byte boundary.
+        C{observer} is an C{LZSSObserver}.
+        """
         self.close_in_stream = close_in_stream
         self._in = in_
         self._ctx = ctx
-        self._enc_fmt = bitstruct.compile(
-            f'u{ctx.encoded_offset_size}u{ctx.encoded_len_size}'
-        )
+        self._buffer_size = buffer_size
+        self._data = _READ_PADDING  # padded so that slices are never short
+        self._bit_pos = skip_bits   # next bit to parse in _data
+        self._num_bits = 0          # number of bits (without padding)
+        self._discarded = 0         # bytes of the stream dropped from _data
+        self._observer = observer
+        self._tokens = self._observed(self._iter_tokens()) if observer else self._iter_tokens()
+    #:
+    @property
+    def bit_position(self) -> int:
+        """
+        Position, in bits from the start of the stream, of the next
+        token to be read.
+        """
+        return self._discarded * 8 + self._bit_pos
     #:
     def read(self):
+        return next(self._tokens, (False, b''))
+    #:
+    def feed(self, data: bytes):
+        """
+        For readers without an input stream ('in_' is C{None}): adds
+        C{data} to the buffer and returns an iterator over the tokens
+        that are now complete. Incomplete tokens wait for the next call.
+        """
+        if data:
+            self._append(data)
+        return self._observed(self._parse()) if self._observer else self._parse()
+    #:
+    def _fill(self) -> bool:
+        block = self._in.read(self._buffer_size) if self._in else b''
+        if not block:
+            return False
+        self._append(block)
+        return True
+    #:
+    def _append(self, block: bytes):
+        if self._observer:
+            self._observer.bytes_read(len(block))
+        start = self._bit_pos >> 3
+        self._discarded += start
+        self._data = self._data[start:self._num_bits >> 3] + block + _READ_PADDING
+        self._bit_pos &= 7
+        self._num_bits = (len(self._data) - len(_READ_PADDING)) * 8
+    #:
+    def _parse(self):
+        """
+        Parses the tokens that are complete in the current block. Each
+        token is extracted from an integer made of the few bytes that
+        contain it.
+        """
         ctx = self._ctx
-        assert len(self.buffer) <= ctx.encoded_string_size + 8
-
-        if self._end_of_data():
-            return False, b''
-
-        if not self.buffer:
-            self.buffer.frombytes(self._in.read(1))
-        encoded = bool(self.buffer[0])
-
-        needed_bits = 1 + [ctx.unencoded_string_size, ctx.encoded_string_size][encoded]
-        bytes_to_read = math.ceil((needed_bits - len(self.buffer)) / 8)
-        self.buffer.frombytes(self._in.read(bytes_to_read))
-
-        data: bitarray = self.buffer[1:needed_bits]
-        del self.buffer[:needed_bits]
-
-        if encoded:
-            pos, len_ = self._enc_fmt.unpack(data.tobytes())
-            return True, (pos, len_ + ctx.min_string_size)
-        return False, data.tobytes()
-    #:
-    def _end_of_data(self) -> bool:
-        # Remember: The input stream may be at eof, but the buffer may 
-        # still have 0's. Why? Padding to fill the last byte when 
-        # encoding.
-        buffer_maybe_empty = (
-            not self.buffer or 
-            (self.buffer.count(0) == len(self.buffer) and len(self.buffer) < 8)
-        )
-        curr_pos = self._in.tell()
-        eof = buffer_maybe_empty and not self._in.read(1)
-        self._in.seek(curr_pos)
-        return eof
+        data, num_bits, pos = self._data, self._num_bits, self._bit_pos
+        len_size, min_size = ctx.encoded_len_size, ctx.min_string_size
+        len_mask = (1 << len_size) - 1
+        enc_bits = 1 + ctx.encoded_string_size
+        enc_mask = (1 << ctx.encoded_string_size) - 1
+        enc_width = (7 + enc_bits + 7) // 8
+        unenc_bits = 1 + ctx.unencoded_string_size
+        unenc_mask = (1 << ctx.unencoded_string_size) - 1
+        unenc_width = (7 + unenc_bits + 7) // 8
+        unenc_bytes = ctx.unencoded_string_size // 8
+        from_bytes = int.from_bytes
+        while pos < num_bits:
+            i = pos >> 3
+            if data[i] >> (7 - (pos & 7)) & 1:
+                if pos + enc_bits > num_bits:
+                    break
+                shift = enc_width * 8 - (pos & 7) - enc_bits
+                value = from_bytes(data[i:i + enc_width], 'big') >> shift & enc_mask
+                pos += enc_bits
+                self._bit_pos = pos
+                yield True, (value >> len_size, (value & len_mask) + min_size)
+            else:
+                if pos + unenc_bits > num_bits:
+                    break
+                shift = unenc_width * 8 - (pos & 7) - unenc_bits
+                value = from_bytes(data[i:i + unenc_width], 'big') >> shift & unenc_mask
+                pos += unenc_bits
+                self._bit_pos = pos
+                yield False, (
+                    _BYTES[value] if unenc_bytes == 1 else value.to_bytes(unenc_bytes, 'big')
+                )
+    #:
+    def _iter_tokens(self):
+        while True:
+            yield from self._parse()
+            if not self._fill():
+                break
+    #:
+    def _observed(self, tokens):
+        """
+        Passes C{tokens} through, giving their elements to the observer
+        in batches.
+        """
+        batch = []
+        try:
+            for token in tokens:
+                batch.append(token[1])
+                yield token
+                if len(batch) >= _OBSERVER_BATCH:
+                    self._observer.tokens(batch)
+                    batch = []
+        finally:
+            self._observer.tokens(batch)
     #:
     def __iter__(self):
-        return self
+        return self._tokens
     #:
     def __next__(self):
-        data = self.read()
-        if not data[1]:
-            raise StopIteration()
-        return data
-    #:
-    def close(self):
-        assert len(self.buffer) < 16
-        empty_buffer = not self.buffer or self.buffer.count(0) == len(self.buffer)
-        if not empty_buffer:
-            raise LZSSReader.UnreadData(
-                'Unread compressed data in buffer.'
-            )
-        if self.close_in_stream:
-            self._in.close()        
+        return next(self._tokens)
+    #:
+    def close(self, check_unread=True):
+        # Remember: The input stream may be at eof, but there may still
+        # be up to 7 bits with 0's. Why? Padding to fill the last byte
+        # when encoding.
+        unread_bits = self._num_bits - self._bit_pos
+        if check_unread and unread_bits > 0:
+            last_bits = self._data[self._bit_pos >> 3] & ((1 << unread_bits) - 1)
+            if unread_bits >= 8 or last_bits:
+                raise LZSSReader.UnreadData(
+                    'Unread compressed data in buffer.'
+                )
+        if self.close_in_stream and self._in:
+            self._in.close()
     #:
     def __enter__(self):
         return self
     #:
     def __exit__(self, exc_type, exc_value, traceback):
-        self.close()
+        # Check for unread data only if an exception hasn't occurred
+        self.close(not exc_value)
     #:
     class UnreadData(Exception): 
         pass
@@ -3,25 +3,58 @@
 This is a work of our python class, we're implementing a compressor/decompressor using the LZSS method
 
     Usage:
-        pzyp.py [-c [-l LEVEL] | -d] [-sh] [-p PASSWORD] FILE
+        pzyp.py [-c [-l LEVEL] | -d | -t] [-j N] [-sh] [-p PASSWORD] [-D DICT] [--stats] [--mmap] FILE
+        pzyp.py -a [-l LEVEL] [-j N] ARCHIVE PATH...
+        pzyp.py -x ARCHIVE [MEMBER...]
+        pzyp.py --list ARCHIVE
+        pzyp.py train [--size=BYTES] DICT SAMPLE...
         pzyp.py
 
     Options: (some of the options will be implemented after)
         -h, --help                  show this text
         -c, --compress              compress FILE
         -d, --decompress            decompress FILE
+        -t, --verify                test FILE: decode it and check its
+                                    CRCs, without writing anything
         -l, --comprlevel=LEVEL      compressing LEVEL [default: 2]
+        -j, --jobs=N                compress FILE in independent blocks,
+                                    or decompress those blocks, with N
+                                    processes (0: one per CPU)
         -s, --sumary                meta-info of compressed FILE
-        -p, --password=PASSWORD     establishes a PASSWORD for FILE encription
+        -a, --archive               pack the files in PATH... (directories
+                                    are searched recursively) into ARCHIVE
+        -x, --extract               extract the MEMBERs of ARCHIVE (all by
+                                    default) into the current directory
+        --list                      list the members of ARCHIVE
+        -p, --password=PASSWORD     encrypt FILE with PASSWORD when compressing
+                                    (AES-GCM, key derived with scrypt), or
+                                    decrypt it when decompressing/testing
+        -D, --dict=DICT             compress FILE with the preset dictionary
+                                    DICT (made by 'train'), which is then
+                                    needed to decompress/test it
+        --stats                     print a JSON summary of what the codec did:
+                                    bytes, literals and references, match
+                                    lengths, search depth and times (only
+                                    bytes and total time with --jobs)
+        --mmap                      memory map FILE when compressing, or the
+                                    output file when decompressing (if
+                                    its size is in the header)
+        --size=BYTES                size of the dictionary made by 'train'
+                                    from the SAMPLE files [default: 16384]
 
-    LEVEL: is an int that ranges between 1 and 4; the
-    compression LEVEL affects the window dimension(size of buffer)
-    and the maximum size sequence.(to be implemented)
+    LEVEL: is an int that ranges between 1 and 9; the
+    compression LEVEL affects the window dimension(size of buffer),
+    the maximum size sequence and how hard the compressor looks for
+    matches. Levels 1 to 4 take the longest match found (greedy),
+    levels 5 to 7 look one byte ahead for a longer match (lazy) and
+    levels 8 and 9 choose, among the matches found, the tokens that
+    take the fewest bits (optimal). Higher levels search longer hash
+    chains.
 
     Level 1: W =  1 KB ⇒10 bits    M = 15 + 2 ⇒4 bits
     Level 2: W =  4 KB⇒12 bits    M = 15 + 3⇒4 bits
     Level 3: W = 16 KB ⇒ 14 bits   M = 32 + 3 ⇒ 5 bits
-    Level 4: W = 32 KB ⇒ 15 bits   M = 32 + 3 ⇒ 5 bits
+    Level 4 to 9: W = 32 KB ⇒ 15 bits   M = 32 + 3 ⇒ 5 bits
 
 
     The output file will have the same name as the FILE with the extension .LZS
@@ -37,92 +70,596 @@ This is a work of our python class, we're implementing a compressor/decompressor
 """
 
 
-from collections import deque
+import bisect
+from collections import Counter, deque, OrderedDict
+from contextlib import contextmanager
+import heapq
+import io
+import mmap
 import os
 import sys
 from typing import BinaryIO
-from docopt import docopt
 import time
 import struct
-from typing import BinaryIO
-from cryptography.fernet import Fernet
-import base64, hashlib
+import zlib
 import lzss_io as lz
-import desktop_app1 as mw
 
-LEVEL = {1: (10, 4), 2: (12, 4), 3: (14, 5), 4: (15, 5)}
+# The GUI (PySide6), the encryption (cryptography), the argument parser and
+# the process pools are only imported when needed, so that scripts and
+# the command line don't pay for loading them.
 
-ARGS = docopt(__doc__)
+# LEVEL: (window bits, length bits, max. hash chain depth, parsing)
+LEVEL = {
+    1: (10, 4, 4, lz.GREEDY),
+    2: (12, 4, 16, lz.GREEDY),
+    3: (14, 5, 32, lz.GREEDY),
+    4: (15, 5, 64, lz.GREEDY),
+    5: (15, 5, 128, lz.LAZY),
+    6: (15, 5, 192, lz.LAZY),
+    7: (15, 5, 256, lz.LAZY),
+    8: (15, 5, 256, lz.OPTIMAL),
+    9: (15, 5, 512, lz.OPTIMAL),
+}
 
 FILE_EXTENTION = 'lzs'
 ENCODING = 'utf-8'
+DEFAULT_LEVEL = 2
+MEMORY_NAME = '-'           # file name in the header of in-memory data
+CHUNK_SIZE = 64 * 1024      # decoded bytes buffered before writing
+BLOCK_SIZE = 64 * 1024      # input bytes read at a time when encoding
+OPTIMAL_SEGMENT = 4096      # positions parsed at once by parse_optimal
+OPTIMAL_LOOKAHEAD = 256     # positions past the segment it also looks at
+RUN_MIN = 16                # literals in a row before looking for a run
+RUN_CHUNK = 16              # positions first scanned for a run of literals
+INSERT_COPY_MIN = 8         # positions for insert_range to copy the keys
+PARALLEL_BLOCK_SIZE = 1024 * 1024   # independent blocks for -j N
+
+# Header of a '.lzs' file, followed by the file name. When the original
+# size and CRC-32 can't go in the header, they follow the compressed
+# stream in a TRAILER.
+HEADER_MAGIC = b'PZYP'
+HEADER_VERSION = 1
+HEADER = struct.Struct('<4sBBBBBQIdH')  # magic, version, level, window bits,
+                                        # length bits, flags, original size,
+                                        # CRC-32, timestamp, name size
+FLAG_NO_SIZE = 0x01         # original size and CRC-32 not written
+FLAG_ENCRYPTED = 0x02       # CRYPT_HEAD and encrypted frames follow
+FLAG_DICTIONARY = 0x04      # DICTIONARY_ID follows the file name
+FLAG_BLOCKS = 0x08          # a BlockTable follows (compressed in parallel)
+FLAG_TRAILER = 0x10         # TRAILER follows the compressed stream
+DICTIONARY_ID = struct.Struct('<I')     # CRC-32 of the preset dictionary
+TRAILER = struct.Struct('<QI')          # original size, CRC-32
+
+# Encryption: the compressed stream is split in frames of FRAME_SIZE
+# bytes, each one encrypted (AEAD) with a nonce made of a random prefix,
+# the frame number and a flag for the last frame. The key is derived
+# from the password with scrypt. The header and the CRYPT_HEAD are
+# authenticated with every frame; the original size and CRC-32 are only
+# in the (encrypted) trailer.
+CRYPT_HEAD = struct.Struct('<BBBB16s7sI')   # cipher, log2(n), r, p, salt,
+                                            # nonce prefix, frame size
+CIPHERS = {1: 'AESGCM', 2: 'ChaCha20Poly1305'}  # in cryptography...aead
+DEFAULT_CIPHER = 1
+SCRYPT_PARAMS = (15, 8, 1)  # log2(n), r, p
+SCRYPT_MAX_PARAMS = (20, 32, 16)    # largest ones accepted when decrypting
+FRAME_SIZE = 64 * 1024
+MAX_FRAME_SIZE = 16 * 2 ** 20
+TAG_SIZE = 16
+
+# Preset dictionaries (see train_dictionary)
+DICT_SEGMENT = 64           # bytes in each candidate segment
+DICT_DMER = 8               # bytes in the strings that score a segment
+
+# A block table follows the header of files compressed in parallel
+# (with FLAG_BLOCKS).
+BLOCK_TABLE_MAGIC = b'\x9fPZC'
+BLOCK_TABLE_HEAD = struct.Struct('<4sII')   # magic, block size, count
+BLOCK_TABLE_ENTRY = struct.Struct('<III')   # compressed size, size, CRC-32
+
+# Side index of a sequential file, cached by PzypFile
+INDEX_EXTENSION = '.idx'
+INDEX_SPAN = 1024 * 1024    # original bytes between index entries
+INDEX_MAGIC = b'PZYI'
+INDEX_HEAD = struct.Struct('<4sIQQI')   # magic, span, file size, mtime, count
+INDEX_ENTRY = struct.Struct('<QQQI')    # start bit, offset, size, window size
 
 
+_BYTES = [bytes((i,)) for i in range(256)]    # the literal of each byte value
+
 class Window:
+    """
+    The sliding window of the compressor. Instead of scanning the
+    whole window for every byte, previous strings are found through
+    hash chains: C{_head} maps the first C{min_string_size} bytes of a
+    string to the last position where they were seen, and C{_prev}
+    links each position to the previous one with the same bytes. Only
+    the last C{window_size} positions are kept in C{_prev}, so it's
+    indexed like a ring.
+
+    Positions are absolute (counted from the start of the input), while
+    C{_dictionary} only holds the data from position C{_base} onwards:
+    the window plus the input that hasn't been encoded yet.
+    """
     def __init__(self, ctx=lz.PZYPContext()):
-        self._dictionary = deque(maxlen=2 ** ctx.encoded_offset_size)
+        self._dictionary = bytearray()
+        self._base = 0
+        self._size = ctx.window_size
+        self._mask = ctx.window_size - 1
+        self._key_size = ctx.min_string_size
+        self._max_chain = ctx.max_chain
+        self._head = {}
+        self._prev = [-1] * ctx.window_size
         self._values = [ctx.encoded_offset_size, ctx.encoded_len_size]
-
+        self._found = []        # results of find_range from _found_start
+        self._found_start = 0
+        self.searches = 0       # calls to find
+        self.chain_steps = 0    # candidates visited by those calls
 
     def extend(self, data: bytes):
-        self._dictionary.append(data)
-        if len(self._dictionary) >= self._dictionary.maxlen:
-            self._dictionary.popleft()
-
-    def get_dict(self):
-        return list(self._dictionary)
-    
-    def find(self, check_elements):
-        i = 0
-        offset = 0
-        for element in self._dictionary:
-            if len(check_elements) <= offset:
-                return i - len(check_elements)
-
-            if check_elements[offset] == element:
-                offset += 1
-            else:
-                offset = 0
+        self._dictionary += data
+
+    def slide(self, pos: int):
+        """
+        Forgets the data, and the hash chain heads, that can no longer
+        be referenced from C{pos} onwards.
+        """
+        limit = pos - self._size
+        if limit - self._base >= BLOCK_SIZE:
+            del self._dictionary[:limit - self._base]
+            self._base = limit
+            self._head = {k: p for k, p in self._head.items() if p > limit}
+
+    def literal(self, pos: int) -> bytes:
+        return _BYTES[self._dictionary[pos - self._base]]
 
-            i += 1
-        return -1
+    def literals(self, pos: int, count: int) -> bytes:
+        """
+        The C{count} bytes at C{pos} as a single token: a literal, or a
+        C{LiteralRun} that C{LZSSWriter} packs in bulk.
+        """
+        if count == 1:
+            return self.literal(pos)
+        i = pos - self._base
+        return lz.LiteralRun(self._dictionary[i:i + count])
+
+    def insert(self, pos: int):
+        i = pos - self._base
+        key = bytes(self._dictionary[i:i + self._key_size])
+        if len(key) == self._key_size:
+            self._prev[pos & self._mask] = self._head.get(key, -1)
+            self._head[key] = pos
+
+    def insert_range(self, start: int, stop: int):
+        """
+        Same as C{insert} for each position from C{start} to C{stop},
+        but the keys are cut from one copy of the data (unless there
+        are only a few of them: copying costs more than it saves).
+        """
+        key_size = self._key_size
+        if stop - start < INSERT_COPY_MIN:
+            data, base = self._dictionary, self._base
+            head, prev, mask = self._head, self._prev, self._mask
+            for pos in range(start, stop):
+                i = pos - base
+                key = bytes(data[i:i + key_size])
+                if len(key) == key_size:
+                    prev[pos & mask] = head.get(key, -1)
+                    head[key] = pos
+            return
+        i = start - self._base
+        chunk = bytes(self._dictionary[i:i + stop - start + key_size - 1])
+        keys = [chunk[j:j + key_size] for j in range(len(chunk) - key_size + 1)]
+        head, prev, mask = self._head, self._prev, self._mask
+        for pos, key in zip(range(start, stop), keys):
+            prev[pos & mask] = head.get(key, -1)
+            head[key] = pos
+
+    def literal_run(self, pos: int, stop: int) -> int:
+        """
+        How many positions from C{pos} (up to C{stop}) have no match,
+        ie, C{find} would return C{(0, 0)} for each of them if the ones
+        before were inserted: their first C{min_string_size} bytes
+        aren't in the window, nor repeated earlier in the run. The run
+        is scanned in chunks that double, since most runs are short
+        (but incompressible data is one long run).
+        """
+        data, base, head = self._dictionary, self._base, self._head
+        key_size = self._key_size
+        size = self._size
+        seen = set()
+        run = 0
+        chunk_size = RUN_CHUNK
+        while pos + run < stop:
+            start = pos + run
+            count = min(chunk_size, stop - start)
+            i = start - base
+            chunk = bytes(data[i:i + count + key_size - 1])
+            keys = [chunk[j:j + key_size] for j in range(count)]
+            limit = start - size
+            for key, cand in zip(keys, map(head.get, keys)):
+                if (cand is not None and cand > limit) or key in seen:
+                    return run
+                seen.add(key)
+                run += 1
+                limit += 1
+            chunk_size *= 2
+        return run
+
+    def find(self, pos: int, max_len: int):
+        """
+        Returns the pair C{(offset, length)} for the longest string in
+        the window that matches the data at C{pos}, where C{offset} is
+        the distance back from C{pos}. Returns C{(0, 0)} if no string
+        with at least C{min_string_size} bytes was found. The match
+        may overlap C{pos} (eg, a run of the same byte has offset 1).
+        """
+        data = self._dictionary
+        key_size = self._key_size
+        prev, mask, base = self._prev, self._mask, self._base
+        limit = pos - self._size
+        if limit < -1:
+            limit = -1
+        best_off = best_len = 0
+        p = pos - base
+        cand = self._head.get(bytes(data[p:p + key_size]), -1)
+        chain = self._max_chain
+        while cand > limit and chain:
+            chain -= 1
+            c = cand - base
+            if data[c + best_len] == data[p + best_len]:
+                length = key_size
+                while length < max_len and data[c + length] == data[p + length]:
+                    length += 1
+                if length > best_len:
+                    best_off, best_len = pos - cand, length
+                    if length == max_len:
+                        break
+            cand = prev[cand & mask]
+        self.searches += 1
+        self.chain_steps += self._max_chain - chain
+        if best_len < key_size:
+            return 0, 0
+        return best_off, best_len
+
+    def find_range(self, start: int, stop: int, max_len: int, end: int) -> list:
+        """
+        C{find}, then C{insert}, for each position from C{start} to
+        C{stop} (the matches can't go past C{end}) and returns the
+        results. The positions already searched by the previous call,
+        from C{start} onwards, aren't searched again.
+        """
+        found = self._found[start - self._found_start:]
+        for pos in range(start + len(found), stop):
+            found.append(self.find(pos, min(max_len, end - pos)))
+            self.insert(pos)
+        self._found, self._found_start = found, start
+        return found
 
     def ctxValues(self):
         return self._values
-        
-    def head_writer(self, win_dimention, max_seq, in_, out):
-        dt = time.time()                                      
-        fl = str(dt)
-        newl = '\n'
-
-        with open(out, 'wb+') as f:
-            f.write(bytes(str(win_dimention)+' ', ENCODING))
-            f.write(bytes(str(max_seq)+' ', ENCODING))
-            f.write(struct.pack('{}s'.format(len(fl)),bytes(fl, ENCODING)))
-            if len(bytes(f' {in_} {newl}', ENCODING)) < 255:
-                f.write(bytes(f' {in_} {newl}', ENCODING))
-            else:
-               newName=in_.split('/')
-               f.write(bytes(' '+ newName[-1] +' '+newl, ENCODING))
+
+    def copy(self):
+        window = Window.__new__(Window)
+        window.__dict__.update(self.__dict__)
+        window._dictionary = self._dictionary[:]
+        window._head = self._head.copy()
+        window._prev = self._prev[:]
+        window._found = self._found[:]
+        return window
+
+class MappedWindow(Window):
+    """
+    A C{Window} over the whole input, already in memory: an C{mmap} of
+    the input file (or any buffer). The match finder reads the data
+    where it is, so C{extend} copies nothing and C{slide} only forgets
+    old hash chain heads. Positions are offsets in C{buffer}.
+    """
+    def __init__(self, buffer, ctx=lz.PZYPContext()):
+        super().__init__(ctx)
+        self._dictionary = buffer
+        self._pruned = 0    # hash chain heads before this were dropped
+
+    def extend(self, data: bytes):
+        pass
+
+    def slide(self, pos: int):
+        limit = pos - self._size
+        if limit - self._pruned >= BLOCK_SIZE:
+            self._pruned = limit
+            self._head = {k: p for k, p in self._head.items() if p > limit}
+
+class Header:
+    """
+    The header of a '.lzs' file: a fixed-size C{HEADER} struct followed
+    by the name of the compressed file (C{name_size} bytes, UTF-8) and,
+    with C{FLAG_DICTIONARY}, the id of the preset dictionary. The
+    original size and its CRC-32 are only meaningful without the
+    C{FLAG_NO_SIZE} flag: when the output isn't seekable they can't be
+    written back once the data is compressed, so they go in a
+    C{TRAILER} after the compressed stream instead (C{FLAG_TRAILER}).
+    """
+    def __init__(self, window_bits: int, len_bits: int, level=0, name=MEMORY_NAME,
+                 timestamp=None, flags=0, original_size=0, crc=0, dictionary_id=None):
+        self.window_bits = window_bits
+        self.len_bits = len_bits
+        self.level = level
+        self.name = name
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.flags = flags
+        self.original_size = original_size
+        self.crc = crc
+        self.dictionary_id = dictionary_id
+        if dictionary_id is not None:
+            self.flags |= FLAG_DICTIONARY
+
+    @classmethod
+    def for_context(cls, ctx: lz.PZYPContext, **kargs):
+        return cls(ctx.encoded_offset_size, ctx.encoded_len_size, level_of(ctx), **kargs)
+
+    def pack(self) -> bytes:
+        name = self.name.encode(ENCODING)
+        head = HEADER.pack(
+            HEADER_MAGIC, HEADER_VERSION, self.level, self.window_bits, self.len_bits,
+            self.flags, self.original_size, self.crc, self.timestamp, len(name),
+        ) + name
+        if self.dictionary_id is not None:
+            head += DICTIONARY_ID.pack(self.dictionary_id)
+        return head
+
+    def write(self, out: BinaryIO) -> int:
+        """
+        Writes the header to C{out} and returns where it starts (for
+        C{patch}), or C{-1} if the size and CRC-32 go in the trailer:
+        if C{out} isn't seekable (the header is then written with
+        C{FLAG_NO_SIZE} and C{FLAG_TRAILER}) or the header already has
+        C{FLAG_TRAILER}.
+        """
+        if not getattr(out, 'seekable', lambda: False)():
+            self.flags |= FLAG_NO_SIZE | FLAG_TRAILER
+        pos = -1 if self.has_trailer else out.tell()
+        out.write(self.pack())
+        return pos
+
+    def patch(self, out: BinaryIO, pos: int, original_size: int, crc: int):
+        """
+        Writes the original size and CRC into the header written at
+        C{pos} in C{out}, keeping the current position.
+        """
+        self.original_size, self.crc = original_size, crc
+        if pos < 0:
+            return
+        end_pos = out.tell()
+        out.seek(pos)
+        out.write(self.pack())
+        out.seek(end_pos)
+
+    @property
+    def size_known(self) -> bool:
+        return not self.flags & FLAG_NO_SIZE
+
+    @property
+    def encrypted(self) -> bool:
+        return bool(self.flags & FLAG_ENCRYPTED)
+
+    @property
+    def blocks(self) -> bool:
+        return bool(self.flags & FLAG_BLOCKS)
+
+    @property
+    def has_trailer(self) -> bool:
+        return bool(self.flags & FLAG_TRAILER)
+
+    def preset(self, dictionary) -> bytes:
+        """
+        The data that goes in the window before the first byte: the end of
+        the preset dictionary named in the header, which must be
+        C{dictionary} (C{ValueError} otherwise).
+        """
+        if self.dictionary_id is None:
+            return b''
+        if dictionary is None or dictionary.id != self.dictionary_id:
+            raise ValueError(f'Needs the preset dictionary {self.dictionary_id:08x}')
+        return dictionary.prefix(self.context.window_size)
+
+    def check(self, size: int, crc=None):
+        """
+        Raises C{ChecksumError} if the original size (and C{crc}, unless
+        it's C{None}) are known and differ from C{size} and C{crc}.
+        """
+        if self.size_known and (size != self.original_size or crc not in (None, self.crc)):
+            raise ChecksumError('Decoded data doesn\'t match the size or CRC-32 in the header')
+
+    @staticmethod
+    def check_trailer(trailer: bytes, size: int, crc: int):
+        """
+        Raises C{ChecksumError} if C{trailer} isn't a whole C{TRAILER}
+        or differs from C{size} and C{crc}.
+        """
+        if len(trailer) != TRAILER.size:
+            raise ChecksumError('Truncated data (no trailer)')
+        if TRAILER.unpack(trailer) != (size, crc):
+            raise ChecksumError('Decoded data doesn\'t match the size or CRC-32 in the trailer')
+
+    @property
+    def context(self) -> lz.PZYPContext:
+        """
+        The context needed to decode the data.
+        """
+        return lz.PZYPContext(encoded_offset_size=self.window_bits, encoded_len_size=self.len_bits)
+
+    @staticmethod
+    def packed_size(data: bytes) -> int:
+        """
+        The size of the header at the start of C{data}, or C{0} if
+        C{data} is too short to tell.
+        """
+        if len(data) < HEADER.size:
+            return 0
+        fields = HEADER.unpack_from(data)
+        flags, name_size = fields[5], fields[-1]
+        return HEADER.size + name_size + (DICTIONARY_ID.size if flags & FLAG_DICTIONARY else 0)
+
+    @classmethod
+    def unpack(cls, data: bytes):
+        magic, version, level, window_bits, len_bits, flags, size, crc, timestamp, name_size = (
+            HEADER.unpack_from(data)
+        )
+        if magic != HEADER_MAGIC:
+            raise ValueError('Not a PZYP file (bad magic)')
+        if version != HEADER_VERSION:
+            raise ValueError(f'Unsupported PZYP version {version}')
+        name = bytes(data[HEADER.size:HEADER.size + name_size]).decode(ENCODING)
+        dictionary_id = None
+        if flags & FLAG_DICTIONARY:
+            dictionary_id, = DICTIONARY_ID.unpack_from(data, HEADER.size + name_size)
+        return cls(window_bits, len_bits, level, name, timestamp, flags, size, crc, dictionary_id)
+
+    @classmethod
+    def read(cls, in_: BinaryIO):
+        """
+        Reads the header at the current position of C{in_}. Files of
+        older versions, with a text header line (window bits, length
+        bits, timestamp and name, separated by spaces), are also read:
+        they start with a digit, while the magic doesn't. Nothing is
+        read past the header, and C{in_} needn't be seekable.
+        """
+        data = in_.read(1)
+        if data.isdigit():
+            return cls._read_line(data + in_.readline())
+        data += in_.read(HEADER.size - 1)
+        if len(data) < HEADER.size:
+            raise ValueError('Not a PZYP file (truncated header)')
+        return cls.unpack(data + in_.read(cls.packed_size(data) - HEADER.size))
+
+    @classmethod
+    def _read_line(cls, line: bytes):
+        window_bits, len_bits, timestamp, name = line.split()[:4]
+        return cls(
+            int(window_bits), int(len_bits), name=name.decode(ENCODING),
+            timestamp=float(timestamp), flags=FLAG_NO_SIZE,
+        )
+
+class ChecksumError(ValueError):
+    """
+    The decoded data doesn't match the size or CRC-32 recorded when it
+    was compressed.
+    """
+
+class BlockTable:
+    """
+    Index of a file compressed in independent blocks: for each block,
+    the size of its compressed data, its original size and the CRC-32
+    of its original data. Blocks are stored one after the other, right
+    after the table.
+    """
+    def __init__(self, block_size: int, entries=()):
+        self.block_size = block_size
+        self.entries = list(entries)
+
+    @staticmethod
+    def packed_size(num_blocks: int) -> int:
+        return BLOCK_TABLE_HEAD.size + num_blocks * BLOCK_TABLE_ENTRY.size
+
+    @staticmethod
+    def num_blocks(head: bytes) -> int:
+        """
+        The number of blocks in the table whose head is C{head}. Raises
+        C{ValueError} if C{head} isn't the head of a table.
+        """
+        magic, _, num_blocks = BLOCK_TABLE_HEAD.unpack(head)
+        if magic != BLOCK_TABLE_MAGIC:
+            raise ValueError('Missing block table')
+        return num_blocks
+
+    @classmethod
+    def unpack(cls, head: bytes, data: bytes):
+        _, block_size, _ = BLOCK_TABLE_HEAD.unpack(head)
+        return cls(block_size, BLOCK_TABLE_ENTRY.iter_unpack(data))
+
+    def write(self, out: BinaryIO):
+        out.write(BLOCK_TABLE_HEAD.pack(BLOCK_TABLE_MAGIC, self.block_size, len(self.entries)))
+        out.write(b''.join(BLOCK_TABLE_ENTRY.pack(*entry) for entry in self.entries))
+
+    @classmethod
+    def read(cls, in_: BinaryIO):
+        """
+        Reads the table at the current position of C{in_} (after a
+        header with C{FLAG_BLOCKS}). Raises C{ValueError} if there's no
+        table there.
+        """
+        head = in_.read(BLOCK_TABLE_HEAD.size)
+        if len(head) < BLOCK_TABLE_HEAD.size:
+            raise ValueError('Missing block table')
+        num_blocks = cls.num_blocks(head)
+        return cls.unpack(head, in_.read(num_blocks * BLOCK_TABLE_ENTRY.size))
+
+    def offsets(self, data_start: int):
+        """
+        Yields C{(offset, size, out_offset, out_size)} for each block:
+        where its compressed data starts in the file (the first block
+        starts at C{data_start}) and where its data goes in the output.
+        """
+        offset, out_offset = data_start, 0
+        for size, out_size, _ in self.entries:
+            yield offset, size, out_offset, out_size
+            offset += size
+            out_offset += out_size
+
+    @property
+    def original_size(self) -> int:
+        return sum(out_size for _, out_size, _ in self.entries)
+
+    def check(self, index: int, size: int, crc: int):
+        """
+        Raises C{ChecksumError} if block C{index} didn't decode to
+        C{size} bytes with the given CRC-32.
+        """
+        _, out_size, block_crc = self.entries[index]
+        if size != out_size or block_crc != crc:
+            raise ChecksumError(f'Block {index} is corrupted')
 
 def head_reader(file_name): 
         with open(file_name, 'rb') as f:
-            header=f.readline().split() 
-            off=header[0].decode(ENCODING)
-            size_sec=header[2] 
-            a = struct.unpack('{}s'.format(len(size_sec)), header[2]) 
-            fn=header[3].decode(ENCODING) 
-            dt_sec = a[0].decode(ENCODING) 
-            dt = time.ctime(float(dt_sec))
-            print(f'File name: {fn}')
+            header = Header.read(f)
+            off = header.window_bits
+            dt = time.ctime(header.timestamp)
+            print(f'File name: {header.name}')
             print(f'Compression date/time:  {dt}')
+            if header.level:
+                print(f'Compression level: {header.level}')
             print(f'Compression parameters : Buffer -> {2**int(off)} ({off} bits),') 
-            if off == 10:
-                print('Max Seq. Len. -> 17 (4 bits)')
-            elif off == 12:
-                print('Max Seq. Len. -> 18 (4 bits)')
-            else:
-                print('Max Seq. Len. -> 35 (5 bits)')
+            ctx = header.context
+            print(f'Max Seq. Len. -> {ctx.max_string_size} ({header.len_bits} bits)')
+            if header.size_known:
+                print(f'Original size: {header.original_size} bytes (CRC-32 {header.crc:08x})')
+            elif header.has_trailer:
+                print('Original size and CRC-32 at the end of the file')
+            if header.encrypted:
+                head = f.read(CRYPT_HEAD.size)
+                cipher = CRYPT_HEAD.unpack(head)[0] if len(head) == CRYPT_HEAD.size else None
+                print(f'Encrypted ({CIPHERS.get(cipher, "unknown cipher")} frames, scrypt key)')
+            if header.dictionary_id is not None:
+                print(f'Preset dictionary: {header.dictionary_id:08x}')
+
+def level_context(level: int) -> lz.PZYPContext:
+    off, leng, chain, strategy = LEVEL[level]
+    return lz.PZYPContext(
+        encoded_offset_size=off,
+        encoded_len_size=leng,
+        max_chain=chain,
+        strategy=strategy,
+    )
+
+def level_of(ctx: lz.PZYPContext) -> int:
+    """
+    The compression level whose parameters are those of C{ctx}, or C{0}
+    if there's none.
+    """
+    values = (ctx.encoded_offset_size, ctx.encoded_len_size, ctx.max_chain, ctx.strategy)
+    for level, level_values in LEVEL.items():
+        if level_values == values:
+            return level
+    return 0
 
 def get_fileName(filName):
     head, tail = os.path.split(filName)
@@ -130,147 +667,1616 @@ def get_fileName(filName):
     result=fileName.split('.')
     return result[0]
 
-def genwrite_key(file, password):
-    hexadecimalPassword = hashlib.md5(password.encode()).hexdigest()
-    key_64 = base64.urlsafe_b64encode(hexadecimalPassword.encode())
-    with open(f'{file}.key', "wb") as key_file:
-        key_file.write(key_64)
-        
-def call_key(file):
-    return open(f'{file}.key', "rb").read()
+def _aead(cipher: int, password: str, salt: bytes, log_n: int, r: int, p: int):
+    from cryptography.hazmat.primitives.ciphers import aead
+    from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+    if cipher not in CIPHERS:
+        raise ValueError(f'Unknown cipher {cipher}')
+    kdf = Scrypt(salt=salt, length=32, n=2 ** log_n, r=r, p=p)
+    return getattr(aead, CIPHERS[cipher])(kdf.derive(password.encode(ENCODING)))
+
+def _frame_nonce(prefix: bytes, number: int, last: bool) -> bytes:
+    return prefix + number.to_bytes(4, 'big') + (b'\x01' if last else b'\x00')
+
+class EncryptWriter:
+    """
+    Encrypts what's written to it into C{out}, frame by frame: first
+    the C{CRYPT_HEAD}, then each frame of C{FRAME_SIZE} bytes with its
+    authentication tag. Only one frame is kept in memory. C{finish}
+    writes the last frame (maybe empty) and must always be called, so
+    that a truncated stream is detected. C{associated_data} (the packed
+    header) is authenticated, followed by the C{CRYPT_HEAD}, with each
+    frame.
+    """
+    def __init__(self, out: BinaryIO, password: str, associated_data=b'',
+                 cipher=DEFAULT_CIPHER, frame_size=FRAME_SIZE):
+        salt, prefix = os.urandom(16), os.urandom(7)
+        self._head = CRYPT_HEAD.pack(cipher, *SCRYPT_PARAMS, salt, prefix, frame_size)
+        self._associated_data = associated_data + self._head
+        self._aead = _aead(cipher, password, salt, *SCRYPT_PARAMS)
+        self._out = out
+        self._prefix = prefix
+        self._frame_size = frame_size
+        self._number = 0
+        self._buffer = bytearray()
+        out.write(self._head)
+
+    def write(self, data) -> int:
+        self._buffer += data
+        frame_size = self._frame_size
+        # a full frame is only written once it's sure not to be the last
+        while len(self._buffer) > frame_size:
+            self._write_frame(self._buffer[:frame_size], last=False)
+            del self._buffer[:frame_size]
+        return len(data)
 
-def openFile(location):
-    file = open(location, 'rb')
-    content = file.read()
-    file.close()
-    return content
+    def finish(self):
+        self._write_frame(self._buffer, last=True)
+        self._buffer = bytearray()
+
+    def _write_frame(self, frame, last: bool):
+        nonce = _frame_nonce(self._prefix, self._number, last)
+        self._out.write(self._aead.encrypt(nonce, bytes(frame), self._associated_data))
+        self._number += 1
+
+class DecryptionError(ValueError):
+    """
+    Wrong password, or the encrypted data was changed or truncated.
+    """
+
+class DecryptReader(io.RawIOBase):
+    """
+    Reads the data written by an C{EncryptWriter} to C{in_}, decrypting
+    and authenticating it one frame at a time (C{DecryptionError}).
+    C{associated_data} must be the one given to the C{EncryptWriter}.
+    """
+    def __init__(self, in_: BinaryIO, password: str, associated_data=b''):
+        super().__init__()
+        head = in_.read(CRYPT_HEAD.size)
+        if len(head) < CRYPT_HEAD.size:
+            raise DecryptionError('Truncated encryption header')
+        cipher, log_n, r, p, salt, self._prefix, frame_size = CRYPT_HEAD.unpack(head)
+        # the head isn't authenticated yet: its costs must be bounded
+        if not all(0 < value <= max_value for value, max_value in zip((log_n, r, p), SCRYPT_MAX_PARAMS)):
+            raise DecryptionError(f'Invalid scrypt parameters {(log_n, r, p)}')
+        if not 0 < frame_size <= MAX_FRAME_SIZE:
+            raise DecryptionError(f'Invalid frame size {frame_size}')
+        self._associated_data = associated_data + head
+        self._aead = _aead(cipher, password, salt, log_n, r, p)
+        self._in = in_
+        self._enc_frame_size = frame_size + TAG_SIZE
+        self._number = 0
+        self._frame = b''
+        self._frame_pos = 0
+        self._next = in_.read(self._enc_frame_size)
+        self._done = False
+        # a wrong password fails here, before anything is decoded
+        self._read_frame()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self._frame_pos == len(self._frame) and not self._done:
+            self._read_frame()
+        count = min(len(buffer), len(self._frame) - self._frame_pos)
+        memoryview(buffer).cast('B')[:count] = self._frame[self._frame_pos:self._frame_pos + count]
+        self._frame_pos += count
+        return count
+
+    def _read_frame(self):
+        from cryptography.exceptions import InvalidTag
+        data = self._next
+        self._next = self._in.read(self._enc_frame_size)
+        last = not self._next
+        try:
+            self._frame = self._aead.decrypt(
+                _frame_nonce(self._prefix, self._number, last), data, self._associated_data,
+            )
+        except InvalidTag:
+            raise DecryptionError('Wrong password or corrupted data') from None
+        self._frame_pos = 0
+        self._number += 1
+        self._done = last
+
+class TrailerReader(io.RawIOBase):
+    """
+    Reads C{in_} but its last C{size} bytes, which are in C{trailer}
+    once the end of C{in_} has been reached. Only those bytes are held
+    back, so C{in_} can be a pipe.
+    """
+    def __init__(self, in_: BinaryIO, size=TRAILER.size):
+        super().__init__()
+        self._in = in_
+        self._size = size
+        self.trailer = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        while True:
+            data = self._in.read(len(view))
+            if not data:
+                return 0
+            data = self.trailer + data
+            count = len(data) - self._size
+            if count > 0:
+                view[:count] = data[:count]
+                self.trailer = data[count:]
+                return count
+            self.trailer = data
 
 def filePathFromUI(in_, out):
     outf='{}.{}'.format(out.split('_')[0], FILE_EXTENTION)
     return[in_, outf]
 
-def encode(in_: BinaryIO, out: BinaryIO, lzss_writer=None, ctx=lz.PZYPContext()):
-    window = Window(ctx)
-    off, leng = window.ctxValues()
-    if len(sys.argv)>= 2:
-        out_f = out.name
-        in_f = in_.name
-        window.head_writer(off, leng, in_f, out_f)
-    else:
-        window.head_writer(off, leng, in_, out)
-        out_f = out
-
-    out_=open(f'{out_f}', 'ab')
-    with (lzss_writer or lz.LZSSWriter(out_, ctx)) as lzss_out:
-        check_characters = []
-        if len(sys.argv)>=2:
-            text = in_.read()
+def parse_greedy(window: Window, tokens: list, pos: int, stop: int, end: int, ctx) -> int:
+    """
+    Takes the longest match at each position, or a literal if there's
+    none. After C{RUN_MIN} literals in a row, the following positions
+    without a match make a single run of literals.
+    """
+    max_len = ctx.max_string_size
+    misses = 0
+    while pos < stop:
+        if misses >= RUN_MIN:
+            misses = 0
+            length = window.literal_run(pos, stop)
+            if length:
+                tokens.append(window.literals(pos, length))
+                window.insert_range(pos, pos + length)
+                pos += length
+                continue
+        offset, length = window.find(pos, min(max_len, end - pos))
+        if length:
+            misses = 0
+            tokens.append((offset, length))
+            window.insert_range(pos, pos + length)
+            pos += length
         else:
-            text = openFile(in_)
-
-        i = 0
-        for char in text:
-            check_characters.append(char)
-            index = window.find(check_characters)
-
-            if index == -1 or i == len(text) - 1:
-                if len(check_characters) > 1:
-                    index = window.find(check_characters[:-1])
-                    if index <= lz.MAX_STRING_SIZE:
-                        offset = i - index - len(check_characters) + 1 
-                        length = len(check_characters) 
-                        token = f"<{offset},{length}>" 
-
-                    if len(token) > length:
-                        for byte_ in check_characters:
-                            lzss_out.write(bytes((byte_,)))
-                    else:
-                        lzss_out.write((offset, length))
+            misses += 1
+            tokens.append(window.literal(pos))
+            window.insert(pos)
+            pos += 1
+    return pos
+
+def parse_lazy(window: Window, tokens: list, pos: int, stop: int, end: int, ctx) -> int:
+    """
+    Before taking a match, looks for a longer one at the next position.
+    If there is one, the current byte goes out as a literal and the
+    same test is done for the longer match. Runs of literals are taken
+    as in C{parse_greedy}.
+    """
+    max_len = ctx.max_string_size
+    next_match = None
+    misses = 0
+    while pos < stop:
+        if misses >= RUN_MIN:
+            misses = 0
+            length = window.literal_run(pos, stop)
+            if length:
+                tokens.append(window.literals(pos, length))
+                window.insert_range(pos, pos + length)
+                pos += length
+                continue
+        offset, length = next_match or window.find(pos, min(max_len, end - pos))
+        next_match = None
+        if not length:
+            misses += 1
+            tokens.append(window.literal(pos))
+            window.insert(pos)
+            pos += 1
+            continue
+        misses = 0
+        window.insert(pos)
+        if length and length < max_len and pos + 1 < end:
+            next_offset, next_length = window.find(pos + 1, min(max_len, end - pos - 1))
+            if next_length > length:
+                tokens.append(window.literal(pos))
+                next_match = (next_offset, next_length)
+                pos += 1
+                continue
+        tokens.append((offset, length))
+        window.insert_range(pos + 1, pos + length)
+        pos += length
+    return pos
+
+def parse_optimal(window: Window, tokens: list, pos: int, stop: int, end: int, ctx) -> int:
+    """
+    Chooses the tokens that take the fewest bits, according to the
+    sizes given by C{ctx}, among the longest matches found at each
+    position (and their prefixes). The data is parsed in segments that
+    end at multiples of C{OPTIMAL_SEGMENT}: the longest match is found
+    for every position up to C{OPTIMAL_LOOKAHEAD} bytes past the
+    segment, then the cheapest way to reach that point, without a
+    match going past it, is computed backwards. The tokens that start
+    in the segment are taken; the lookahead only keeps the cost of
+    what follows the segment from being ignored. Segments end at fixed
+    positions, so the result doesn't depend on the input blocks.
+    """
+    max_len, min_len = ctx.max_string_size, ctx.min_string_size
+    literal_bits = 1 + ctx.unencoded_string_size
+    match_bits = 1 + ctx.encoded_string_size
+    while pos < stop:
+        seg_end = min((pos // OPTIMAL_SEGMENT + 1) * OPTIMAL_SEGMENT, end)
+        dp_end = min(seg_end + OPTIMAL_LOOKAHEAD, end)
+        if dp_end > stop:
+            break
+        matches = window.find_range(pos, dp_end, max_len, end)
+
+        # cost[k]: bits needed from position pos + k to dp_end
+        size = dp_end - pos
+        cost = [0] * (size + 1)
+        choice = [1] * size
+        for k in range(size - 1, -1, -1):
+            best, best_len = literal_bits + cost[k + 1], 1
+            length = min(matches[k][1], size - k)
+            for l in range(min_len, length + 1):
+                # on ties the longest: the short tokens go to the end
+                if match_bits + cost[k + l] <= best:
+                    best, best_len = match_bits + cost[k + l], l
+            cost[k], choice[k] = best, best_len
+
+        k, seg_size = 0, seg_end - pos
+        while k < seg_size:
+            length = choice[k]
+            if length == 1:
+                tokens.append(window.literal(pos + k))
+            else:
+                tokens.append((matches[k][0], length))
+            k += length
+        pos += k
+    return pos
+
+PARSERS = {lz.GREEDY: parse_greedy, lz.LAZY: parse_lazy, lz.OPTIMAL: parse_optimal}
+
+def encode_span(window: Window, lzss_out, pos: int, stop: int, end: int, ctx, stats=None) -> int:
+    """
+    Parses the data in C{window} from C{pos} up to C{stop}, with the
+    strategy given by C{ctx}. C{end} is the position where the data
+    available in the window ends. The tokens are written in one batch
+    with C{LZSSWriter.write_many}. With C{stats}, the time spent in
+    each step is added to it.
+    Returns the position where the next span must start (the last
+    match may go past C{stop}).
+    """
+    tokens = []
+    if not stats:
+        pos = PARSERS[ctx.strategy](window, tokens, pos, stop, end, ctx)
+        lzss_out.write_many(tokens)
+        return pos
+    start = time.perf_counter()
+    pos = PARSERS[ctx.strategy](window, tokens, pos, stop, end, ctx)
+    parsed = time.perf_counter()
+    lzss_out.write_many(tokens)
+    stats.match_time += parsed - start
+    stats.bits_time += time.perf_counter() - parsed
+    return pos
+
+class Dictionary:
+    """
+    A preset dictionary: data that is put in the window before the
+    first byte, so that even short inputs find matches. Only its last
+    C{window_size} bytes matter. Its id (the CRC-32 of the data) goes in
+    the header, and the same dictionary is needed to decompress.
+
+    Load it once and reuse it: the window with the dictionary already
+    hashed is built once per context and copied for each input.
+    """
+    def __init__(self, data):
+        self.data = bytes(data)
+        self.id = zlib.crc32(self.data)
+        self._windows = {}
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, 'rb') as in_:
+            return cls(in_.read())
+
+    def save(self, path: str):
+        with open(path, 'wb') as out:
+            out.write(self.data)
+
+    def prefix(self, window_size: int) -> bytes:
+        return self.data[-window_size:]
+
+    def window(self, ctx=lz.PZYPContext()) -> Window:
+        key = (ctx.encoded_offset_size, ctx.encoded_len_size, ctx.max_chain)
+        if key not in self._windows:
+            data = self.prefix(ctx.window_size)
+            window = Window(ctx)
+            window.extend(data)
+            for pos in range(len(data) - ctx.min_string_size + 1):
+                window.insert(pos)
+            self._windows[key] = window
+        return self._windows[key].copy()
+
+def train_dictionary(samples, size: int, segment_size=DICT_SEGMENT, dmer_size=DICT_DMER) -> bytes:
+    """
+    Builds a preset dictionary of up to C{size} bytes from C{samples}
+    (bytes-like objects), in the spirit of the COVER algorithm of zstd.
+    The samples are cut in segments of C{segment_size} bytes (half
+    overlapping) and a segment is worth the number of times each
+    distinct string of C{dmer_size} bytes in it appears in the samples.
+    The best segments are taken one at a time, each time ignoring the
+    strings already taken, and the best ones go at the end, so they are
+    the last to leave the window. Strings seen only once don't count.
+    """
+    samples = [bytes(sample) for sample in samples]
+    counts = Counter()
+    for sample in samples:
+        counts.update(sample[i:i + dmer_size] for i in range(len(sample) - dmer_size + 1))
+
+    def score(sample: int, start: int) -> int:
+        segment = samples[sample][start:start + segment_size]
+        dmers = {segment[i:i + dmer_size] for i in range(len(segment) - dmer_size + 1)}
+        return sum(counts[dmer] for dmer in dmers if counts[dmer] > 1)
+
+    step = max(segment_size // 2, 1)
+    heap = [
+        (-score(index, start), index, start)
+        for index, sample in enumerate(samples)
+        for start in range(0, max(len(sample) - segment_size, 0) + 1, step)
+    ]
+    heapq.heapify(heap)
+    chosen, total = [], 0
+    # lazy greedy: scores only go down, so a segment whose updated score
+    # is still the best can be taken without updating the others
+    while heap and total < size:
+        _, index, start = heapq.heappop(heap)
+        current = score(index, start)
+        if not current:
+            continue
+        if heap and current < -heap[0][0]:
+            heapq.heappush(heap, (-current, index, start))
+            continue
+        segment = samples[index][start:start + segment_size]
+        chosen.append(segment)
+        total += len(segment)
+        for i in range(len(segment) - dmer_size + 1):
+            counts[segment[i:i + dmer_size]] = 0
+    return b''.join(reversed(chosen))[-size:]
+
+class StreamEncoder:
+    """
+    Encodes data that arrives in blocks, while it's being read. Only
+    the window and the data not yet encoded are kept in memory. A
+    position is only encoded when there is enough lookahead for the
+    longest match at that position and the next one (and for hashing
+    the strings inside them), so the output doesn't depend on how the
+    input was split into blocks. With a C{Dictionary}, the window
+    starts with it, at positions before the data. With C{stats} (a
+    C{Stats}), the match finder is measured. C{window} replaces the
+    default one (eg, a C{MappedWindow}, fed with slices of its buffer).
+    """
+    def __init__(self, lzss_out, ctx=lz.PZYPContext(), dictionary=None, stats=None, window=None):
+        if window is None:
+            window = dictionary.window(ctx) if dictionary else Window(ctx)
+        self._window = window
+        self._lzss_out = lzss_out
+        self._ctx = ctx
+        self._stats = stats
+        self._lookahead = ctx.max_string_size + ctx.min_string_size + 1
+        start = len(dictionary.prefix(ctx.window_size)) if dictionary else 0
+        self._pos = start   # next position to encode
+        self._end = start   # position where the data in the window ends
+        self.size = 0       # number of bytes fed so far
+        self.crc = 0        # CRC-32 of the bytes fed so far
+
+    def feed(self, block):
+        window = self._window
+        window.extend(block)
+        self._end += len(block)
+        self.size += len(block)
+        self.crc = zlib.crc32(block, self.crc)
+        self._pos = encode_span(
+            window, self._lzss_out, self._pos, self._end - self._lookahead, self._end, self._ctx,
+            self._stats,
+        )
+        window.slide(self._pos)
+
+    def finish(self) -> int:
+        """
+        Encodes what's left in the window. Returns the number of bytes
+        fed.
+        """
+        window, stats = self._window, self._stats
+        encode_span(window, self._lzss_out, self._pos, self._end, self._end, self._ctx, stats)
+        self._pos = self._end
+        if stats:
+            stats.bytes_in += self.size
+            stats.searches += window.searches
+            stats.chain_steps += window.chain_steps
+        return self.size
+
+def encode_blocks(blocks, lzss_out, ctx=lz.PZYPContext(), dictionary=None) -> int:
+    """
+    Encodes the data given by the iterable C{blocks} (of bytes-like
+    objects) with a C{StreamEncoder}. Returns the number of bytes read.
+    """
+    encoder = StreamEncoder(lzss_out, ctx, dictionary)
+    for block in blocks:
+        encoder.feed(block)
+    return encoder.finish()
+
+def read_blocks(in_: BinaryIO, block_size=BLOCK_SIZE):
+    return iter(lambda: in_.read(block_size), b'')
+
+def feed_blocks(encoder: StreamEncoder, blocks, progress=None) -> int:
+    """
+    Feeds C{blocks} to C{encoder}, updating C{progress}, and finishes
+    it. Returns the number of bytes fed.
+    """
+    for block in blocks:
+        encoder.feed(block)
+        if progress:
+            progress.update(len(block))
+    return encoder.finish()
+
+def map_input(in_: BinaryIO):
+    """
+    A read-only C{mmap} of the file C{in_}, or C{None} if it can't be
+    mapped (not a regular file, or empty).
+    """
+    try:
+        size = os.fstat(in_.fileno()).st_size
+        return mmap.mmap(in_.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+def mapped_blocks(buffer, block_size=BLOCK_SIZE):
+    """
+    Yields C{memoryview}s of C{buffer}, C{block_size} bytes each:
+    slices without copies.
+    """
+    view = memoryview(buffer)
+    try:
+        for i in range(0, len(view), block_size):
+            yield view[i:i + block_size]
+    finally:
+        view.release()
+
+class Cancelled(Exception):
+    """
+    The job was cancelled with C{Progress.cancel}.
+    """
+
+class Progress:
+    """
+    Progress of a job that processes C{total} bytes (0 if unknown). The
+    codec calls C{update} after each block it reads (or writes, when
+    decoding), which calls C{callback(progress)}, if given. C{cancel}
+    can be called from any thread: the next C{update} raises
+    C{Cancelled}, so the job stops between blocks.
+    """
+    def __init__(self, total=0, callback=None):
+        self.total = total
+        self.done = 0
+        self.callback = callback
+        self.start = time.perf_counter()
+        self._cancelled = False
+
+    def update(self, size: int):
+        if self._cancelled:
+            raise Cancelled('Cancelled')
+        self.done += size
+        if self.callback:
+            self.callback(self)
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    @property
+    def throughput(self) -> float:
+        """
+        Bytes per second, so far.
+        """
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed else 0.0
+
+    @property
+    def eta(self):
+        """
+        Seconds left at the current throughput, or C{None} if unknown.
+        """
+        throughput = self.throughput
+        if not self.total or not throughput:
+            return None
+        return max(self.total - self.done, 0) / throughput
+
+    def writer(self, write):
+        """
+        C{write} that also updates this progress.
+        """
+        def write_and_update(data):
+            write(data)
+            self.update(len(data))
+        return write_and_update
+
+class Stats(lz.LZSSObserver):
+    """
+    What the codec did, for C{encode} and C{decode_stream} (their
+    C{stats} argument): bytes in and out, literals and references and
+    the length of the references, how many hash chain candidates the
+    match finder visited per search, and the time spent finding matches
+    versus packing the bits (when encoding). It's also the observer of
+    their C{LZSSWriter} or C{LZSSReader}. Without it, the codec only
+    pays for a few tests per block.
+    """
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.literals = 0
+        self.references = 0
+        self.lengths = Counter()    # reference length -> count
+        self.searches = 0
+        self.chain_steps = 0
+        self.match_time = 0.0
+        self.bits_time = 0.0
+        self.total_time = 0.0
+
+    def tokens(self, tokens):
+        lengths = [token[1] for token in tokens if not isinstance(token, bytes)]
+        self.references += len(lengths)
+        self.literals += sum(len(token) for token in tokens if isinstance(token, bytes))
+        self.lengths.update(lengths)
+
+    def bytes_written(self, size: int):
+        self.bytes_out += size
+
+    def bytes_read(self, size: int):
+        self.bytes_in += size
+
+    def add_files(self, in_path: str, out_path: str, start: float):
+        """
+        For jobs that can't be observed (parallel ones): only the sizes
+        of the files and the time since C{start} are recorded.
+        """
+        self.bytes_in += os.path.getsize(in_path)
+        self.bytes_out += os.path.getsize(out_path)
+        self.total_time += time.perf_counter() - start
+
+    def summary(self) -> dict:
+        """
+        The numbers as a C{dict} that can be dumped as JSON.
+        """
+        return {
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'literals': self.literals,
+            'references': self.references,
+            'match_lengths': {str(length): count for length, count in sorted(self.lengths.items())},
+            'average_search_depth': round(self.chain_steps / self.searches, 3) if self.searches else None,
+            'match_finding_s': round(self.match_time, 6),
+            'bit_io_s': round(self.bits_time, 6),
+            'total_s': round(self.total_time, 6),
+            'input_mb_per_s': round(self.bytes_in / 2**20 / self.total_time, 3) if self.total_time else None,
+        }
+
+def encode(in_: BinaryIO, out: BinaryIO, lzss_writer=None, ctx=lz.PZYPContext(), password=None,
+           dictionary=None, progress=None, stats=None, mapped=False):
+    """
+    Compresses C{in_} into C{out}, header included. Both can be file
+    objects or file paths. With a C{password}, the compressed stream
+    goes through an C{EncryptWriter} on its way to C{out}, and the size
+    and CRC-32 go in the (encrypted) trailer instead of the header.
+    With a C{dictionary}, its id goes in the header. C{progress} (a
+    C{Progress}) is updated with each block read, and may cancel the
+    job (C{Cancelled}), leaving C{out} incomplete. C{stats} (a
+    C{Stats}) gets the numbers of the compressed stream.
+
+    If C{mapped}, and C{in_} is a regular file, it's memory mapped and
+    the match finder scans the map instead of copies of the data read
+    (see C{MappedWindow}). The output is the same.
+    """
+    if isinstance(in_, str):
+        with open(in_, 'rb') as in_file:
+            return encode(in_file, out, lzss_writer, ctx, password, dictionary, progress, stats, mapped)
+    if isinstance(out, str):
+        with open(out, 'wb') as out_file:
+            return encode(in_, out_file, lzss_writer, ctx, password, dictionary, progress, stats, mapped)
+
+    header = Header.for_context(
+        ctx, name=getattr(in_, 'name', MEMORY_NAME),
+        flags=FLAG_ENCRYPTED | FLAG_NO_SIZE | FLAG_TRAILER if password else 0,
+        dictionary_id=dictionary.id if dictionary else None,
+    )
+    header_pos = header.write(out)
+    start = time.perf_counter()
+    stream = EncryptWriter(out, password, header.pack()) if password else out
+    source = map_input(in_) if mapped and not dictionary else None
+    try:
+        with (lzss_writer or lz.LZSSWriter(stream, ctx, observer=stats)) as lzss_out:
+            if source is not None:
+                encoder = StreamEncoder(lzss_out, ctx, stats=stats, window=MappedWindow(source, ctx))
+                feed_blocks(encoder, mapped_blocks(source), progress)
+            else:
+                encoder = StreamEncoder(lzss_out, ctx, dictionary, stats)
+                feed_blocks(encoder, read_blocks(in_), progress)
+    finally:
+        if source is not None:
+            try:
+                source.close()
+            except BufferError:
+                pass    # blocks still referenced by a traceback: unmapped when it goes
+    if header.has_trailer:
+        stream.write(TRAILER.pack(encoder.size, encoder.crc))
+    if password:
+        stream.finish()
+    header.patch(out, header_pos, encoder.size, encoder.crc)
+    if stats:
+        stats.total_time += time.perf_counter() - start
+
+def compress_block(data: bytes, ctx=lz.PZYPContext()) -> bytes:
+    """
+    Compresses C{data} as an independent LZSS stream (the window starts
+    empty). Runs in the worker processes of C{encode_parallel}.
+    """
+    with io.BytesIO() as out:
+        with lz.LZSSWriter(out, ctx) as lzss_out:
+            encode_blocks((data,), lzss_out, ctx)
+        return out.getvalue()
+
+def compress_blocks(blocks, jobs, ctx=lz.PZYPContext()):
+    """
+    Compresses each of C{blocks} with C{compress_block}, using C{jobs}
+    processes (C{None}: in this process), and yields C{(size, crc,
+    compressed data)} for each one, in order. At most 2 blocks per
+    process are in flight, so memory doesn't grow with the input size.
+    """
+    if jobs is None:
+        for block in blocks:
+            yield len(block), zlib.crc32(block), compress_block(block, ctx)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    workers = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for block in blocks:
+            pending.append((len(block), zlib.crc32(block), pool.submit(compress_block, block, ctx)))
+            if len(pending) >= 2 * workers:
+                size, crc, future = pending.popleft()
+                yield size, crc, future.result()
+        while pending:
+            size, crc, future = pending.popleft()
+            yield size, crc, future.result()
+
+def encode_parallel(in_: BinaryIO, out: BinaryIO, jobs: int, ctx=lz.PZYPContext(),
+                    block_size=PARALLEL_BLOCK_SIZE):
+    """
+    Splits C{in_} in blocks of C{block_size} bytes and compresses them
+    with C{jobs} processes. After the header comes a C{BlockTable},
+    written first with zeros (the number of blocks is known from the
+    input size) and filled in once every block has been written.
+    """
+    header = Header.for_context(ctx, name=in_.name, flags=FLAG_BLOCKS)
+    header_pos = header.write(out)
+    in_size = os.fstat(in_.fileno()).st_size
+    num_blocks = -(-in_size // block_size)
+    table = BlockTable(block_size)
+
+    table_pos = out.tell()
+    out.write(bytes(BlockTable.packed_size(num_blocks)))
+
+    crc = 0
+    def blocks():
+        nonlocal crc
+        for block in read_blocks(in_, block_size):
+            crc = zlib.crc32(block, crc)
+            yield block
+
+    for size, block_crc, comp_data in compress_blocks(blocks(), jobs, ctx):
+        out.write(comp_data)
+        table.entries.append((len(comp_data), size, block_crc))
+
+    if len(table.entries) != num_blocks:
+        raise ValueError(f'{in_.name} changed size while being compressed')
+    end_pos = out.tell()
+    out.seek(table_pos)
+    table.write(out)
+    out.seek(end_pos)
+    header.patch(out, header_pos, table.original_size, crc)
+
+class TokenDecoder:
+    """
+    Rebuilds the original data from (encoded_flag, element) pairs, as
+    given by an C{LZSSReader}. Decoded bytes are kept in a C{bytearray}
+    that holds the last C{window_size} bytes, for the references, plus
+    the bytes not yet written. These are passed to C{write} once there
+    are at least C{chunk_size} of them, so memory is bounded by
+    C{window_size + chunk_size}. C{window} is the data that preceded
+    the tokens, when decoding starts in the middle of a stream.
+    Tokens can be given in several calls to C{decode}.
+    """
+    def __init__(self, window_size: int, chunk_size=CHUNK_SIZE, window=b''):
+        self._window_size = window_size
+        self._chunk_size = chunk_size
+        self._buffer = bytearray(window[-window_size:])
+        self._pending = len(self._buffer)   # start of the bytes not yet written
+        self.total = 0                      # number of bytes written
+        self.crc = 0                        # CRC-32 of the bytes written
+
+    def decode(self, tokens, write):
+        buffer, pending = self._buffer, self._pending
+        window_size, chunk_size = self._window_size, self._chunk_size
+        for encoded_flag, element in tokens:
+            if encoded_flag:
+                offset, length = element
+                start = len(buffer) - offset
+                if length <= offset:
+                    buffer += buffer[start:start + length]
                 else:
-                    lzss_out.write(bytes((char,)))
+                    # overlapping copy: the last 'offset' bytes repeat
+                    buffer += (buffer[start:] * (length // offset + 1))[:length]
+            else:
+                buffer += element
+            if len(buffer) - pending >= chunk_size:
+                chunk = buffer[pending:]
+                write(chunk)
+                self.total += len(chunk)
+                self.crc = zlib.crc32(chunk, self.crc)
+                if len(buffer) > window_size:
+                    del buffer[:len(buffer) - window_size]
+                pending = len(buffer)
+        self._pending = pending
+
+    def flush(self, write):
+        """
+        Writes the decoded bytes that are still in the buffer.
+        """
+        buffer = self._buffer
+        if len(buffer) > self._pending:
+            chunk = buffer[self._pending:]
+            write(chunk)
+            self.total += len(chunk)
+            self.crc = zlib.crc32(chunk, self.crc)
+            if len(buffer) > self._window_size:
+                del buffer[:len(buffer) - self._window_size]
+            self._pending = len(buffer)
+
+def decode_tokens(tokens, write, window_size: int, chunk_size=CHUNK_SIZE, window=b'') -> int:
+    """
+    Decodes all of C{tokens} with a C{TokenDecoder}, passing the
+    decoded bytes to C{write}. Returns the number of decoded bytes.
+    """
+    decoder = TokenDecoder(window_size, chunk_size, window)
+    decoder.decode(tokens, write)
+    decoder.flush(write)
+    return decoder.total
+
+def max_decoded_size(comp_size: int, ctx=lz.PZYPContext()) -> int:
+    """
+    The most bytes that C{comp_size} bytes of compressed data can
+    decode to: as many references of the longest length as fit, plus
+    one for the bits left (which may hold literals).
+    """
+    return (comp_size * 8 // (1 + ctx.encoded_string_size) + 1) * ctx.max_string_size
+
+def pwrite(fd: int, data, offset: int):
+    if hasattr(os, 'pwrite'):
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data, offset = data[written:], offset + written
+    else:
+        os.lseek(fd, offset, os.SEEK_SET)
+        os.write(fd, data)
 
-                check_characters = []
+def decompress_block(in_path: str, offset: int, size: int, out_path: str,
+                     out_offset: int, out_size: int, ctx=lz.PZYPContext(), crc=None) -> int:
+    """
+    Decodes the block whose compressed data is at C{offset} in
+    C{in_path} and writes it at C{out_offset} in C{out_path}. Runs in
+    the worker processes of C{decode_parallel}, so only the arguments
+    and the returned size go through the process pool. Raises
+    C{ChecksumError} if the block doesn't match C{out_size} and C{crc}.
+    """
+    with open(in_path, 'rb') as in_:
+        in_.seek(offset)
+        comp_data = in_.read(size)
+    data = bytearray()
+    with lz.LZSSReader(io.BytesIO(comp_data), ctx) as lzss_in:
+        decode_tokens(lzss_in, data.extend, ctx.window_size, chunk_size=out_size)
+    if len(data) != out_size or crc not in (None, zlib.crc32(data)):
+        raise ChecksumError(f'Block at {offset} is corrupted')
+    fd = os.open(out_path, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        pwrite(fd, memoryview(data), out_offset)
+    finally:
+        os.close(fd)
+    return out_size
 
-            window.extend(char)
+def decode_parallel(in_path: str, out_path: str, jobs: int) -> bool:
+    """
+    Decodes a file compressed with C{encode_parallel} using C{jobs}
+    processes. The output file is created with its final size and each
+    worker writes its block at the right offset. Returns C{False}, and
+    does nothing, if the file has no block table.
+    """
+    with open(in_path, 'rb') as in_:
+        header = Header.read(in_)
+        if not header.blocks:
+            return False
+        table = BlockTable.read(in_)
+        data_start = in_.tell()
+    ctx = header.context
 
-            i += 1
-    out_.close()
+    with open(out_path, 'wb') as out:
+        out.truncate(table.original_size)
+    from concurrent.futures import ProcessPoolExecutor
+    workers = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(decompress_block, in_path, offset, size, out_path, out_offset, out_size, ctx, crc)
+            for (offset, size, out_offset, out_size), (*_, crc) in zip(table.offsets(data_start), table.entries)
+        ]
+        for future in futures:
+            future.result()
+    return True
 
 def decode(in_: BinaryIO, out: BinaryIO, off_len, lzss_reader=None, ctx=lz.PZYPContext()):
+    """
+    Decodes the data that follows the header in C{in_} into the binary
+    stream C{out}, exactly as it was compressed. Returns the number of
+    decoded bytes.
+    """
     buff_size = off_len[0]  
     len_size = off_len[1]
     ctx=lz.PZYPContext(encoded_offset_size= buff_size, encoded_len_size= len_size)
-    window = Window(ctx)
-    with (lzss_reader or lz.LZSSReader(in_, ctx)) as lzss_in:
-        
-        output = window.get_dict() 
-        result=b''
-        for encoded_flag, element in lzss_in:
-                if encoded_flag:    
-                    prefix_pos, prefix_len = element 
-                    b_decompress = output[-prefix_pos:][:prefix_len]
-                    result += b''.join(b_decompress).strip(b'\r')
-                    for b in b_decompress:
-                        window.extend(b) 
-                        output = window.get_dict() 
+    if lzss_reader:
+        with lzss_reader as lzss_in:
+            return decode_tokens(lzss_in, out.write, ctx.window_size)
+    return decode_stream(in_, out.write, ctx)
+
+def decode_stream(in_: BinaryIO, write, ctx=lz.PZYPContext(), header=None, password=None,
+                  dictionary=None, progress=None, stats=None) -> int:
+    """
+    Decodes the data that follows the header in C{in_}, sequential or
+    in blocks, passing the decoded bytes to C{write}. The CRC-32 of
+    each block, and the size and CRC-32 in C{header} or in the trailer
+    (if C{header} is given), are checked as the data is decoded
+    (C{ChecksumError}). If C{header}
+    says that the data is encrypted, it's decrypted with C{password}
+    while it's decoded; if it names a preset dictionary, C{dictionary}
+    must be that one. C{progress} is updated with the decoded bytes,
+    and C{stats} gets the numbers of the compressed stream.
+    Returns the number of decoded bytes.
+    """
+    if progress:
+        write = progress.writer(write)
+    start = time.perf_counter()
+    if header and header.encrypted:
+        if not password:
+            raise DecryptionError('The data is encrypted and no password was given')
+        in_ = DecryptReader(in_, password, header.pack())
+    table = BlockTable.read(in_) if header and header.blocks else None
+    if not table:
+        if header:
+            window = header.preset(dictionary)
+        else:
+            window = dictionary.prefix(ctx.window_size) if dictionary else b''
+        if header and header.has_trailer:
+            in_ = TrailerReader(in_)
+        with lz.LZSSReader(in_, ctx, observer=stats) as lzss_in:
+            decoder = TokenDecoder(ctx.window_size, window=window)
+            decoder.decode(lzss_in, write)
+            decoder.flush(write)
+        if header:
+            header.check(decoder.total, decoder.crc)
+            if header.has_trailer:
+                header.check_trailer(in_.trailer, decoder.total, decoder.crc)
+        total = decoder.total
+    else:
+        total = 0
+        for index, (comp_size, *_) in enumerate(table.entries):
+            with lz.LZSSReader(io.BytesIO(in_.read(comp_size)), ctx, observer=stats) as lzss_in:
+                decoder = TokenDecoder(ctx.window_size)
+                decoder.decode(lzss_in, write)
+                decoder.flush(write)
+            table.check(index, decoder.total, decoder.crc)
+            total += decoder.total
+        if header:
+            header.check(total)
+    if stats:
+        stats.bytes_out += total
+        stats.total_time += time.perf_counter() - start
+    return total
+
+def decode_into(tokens, out, pos: int) -> int:
+    """
+    Decodes C{tokens} straight into the writable buffer C{out} (eg, an
+    C{mmap} of the output file), from C{pos} on: a reference is a copy
+    of bytes already in C{out}, so there's no separate window. No
+    reference may reach before C{pos}. Literals are single bytes.
+    Returns the position after the last decoded byte. Raises
+    C{ChecksumError} if the data doesn't fit in C{out}.
+    """
+    start, size = pos, len(out)
+    for encoded_flag, element in tokens:
+        if encoded_flag:
+            offset, length = element
+            src = pos - offset
+            if src < start or pos + length > size:
+                raise ChecksumError(f'Invalid reference at {pos}')
+            if length <= offset:
+                out[pos:pos + length] = out[src:src + length]
+            else:
+                # overlapping copy: the last 'offset' bytes repeat
+                out[pos:pos + length] = (out[src:pos] * (length // offset + 1))[:length]
+            pos += length
+        else:
+            if pos >= size:
+                raise ChecksumError(f'Data goes past {size} bytes')
+            out[pos] = element[0]
+            pos += 1
+    return pos
+
+def decode_mapped(in_: BinaryIO, out_path: str, header, stats=None) -> bool:
+    """
+    Decodes the data that follows C{header} in C{in_} into the file
+    C{out_path}, which is created with the original size in C{header}
+    and memory mapped, with C{decode_into}. The data is never held in
+    Python objects, and the kernel writes the pages back. The CRCs
+    are checked as in C{decode_stream}. Returns C{False}, and does
+    nothing, if the size isn't in the header (or it's 0), which is
+    always the case for encrypted files, or the header names a preset
+    dictionary. A size larger than the data can decode to is a
+    C{ChecksumError}, before the file is created.
+    """
+    size = header.original_size
+    if not header.size_known or not size or header.encrypted or header.dictionary_id is not None:
+        return False
+    ctx = header.context
+    if size > max_decoded_size(os.fstat(in_.fileno()).st_size - in_.tell(), ctx):
+        raise ChecksumError('The size in the header is larger than the data can decode to')
+    start = time.perf_counter()
+    table = BlockTable.read(in_) if header.blocks else None
+    with open(out_path, 'w+b') as out:
+        out.truncate(size)
+        with mmap.mmap(out.fileno(), size) as data:
+            if not table:
+                with lz.LZSSReader(in_, ctx, observer=stats) as lzss_in:
+                    end = decode_into(lzss_in, data, 0)
+                header.check(end, zlib.crc32(data))
+            else:
+                for index, (_, comp_size, out_offset, _) in enumerate(table.offsets(0)):
+                    with lz.LZSSReader(io.BytesIO(in_.read(comp_size)), ctx, observer=stats) as lzss_in:
+                        end = decode_into(lzss_in, data, out_offset)
+                    with memoryview(data)[out_offset:end] as block:
+                        table.check(index, len(block), zlib.crc32(block))
+                header.check(table.original_size)
+            data.flush()
+    if stats:
+        stats.bytes_out += size
+        stats.total_time += time.perf_counter() - start
+    return True
+
+class BufferWriter:
+    """
+    A minimal binary stream that writes into a caller-supplied buffer
+    (C{bytearray}, C{memoryview}, ...). Raises C{ValueError} if the
+    buffer is too small.
+    """
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def write(self, data) -> int:
+        size = len(data)
+        if self._pos + size > len(self._view):
+            raise ValueError(f'Buffer too small ({len(self._view)} bytes)')
+        self._view[self._pos:self._pos + size] = data
+        self._pos += size
+        return size
+
+    def tell(self) -> int:
+        return self._pos
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+def compress_into(data, buffer, level=DEFAULT_LEVEL, dictionary=None) -> int:
+    """
+    Compresses C{data} (C{bytes}, C{bytearray}, C{memoryview}, ...)
+    into the writable C{buffer}, with the same header as a '.lzs' file.
+    Returns the number of bytes written to C{buffer}. Raises
+    C{ValueError} if C{buffer} is too small.
+    """
+    out = BufferWriter(buffer)
+    _compress_to(data, out, level_context(level), dictionary)
+    return out.tell()
+
+def compress(data, level=DEFAULT_LEVEL, dictionary=None) -> bytes:
+    """
+    Compresses C{data} and returns it with the same header as a '.lzs'
+    file (with no file name nor time, so the result only depends on
+    C{data}, C{level} and C{dictionary}). A preset C{Dictionary} helps
+    with small inputs that look alike (records, messages, ...).
+    """
+    with io.BytesIO() as out:
+        _compress_to(data, out, level_context(level), dictionary)
+        return out.getvalue()
+
+def _compress_to(data, out, ctx, dictionary=None):
+    view = memoryview(data).cast('B')
+    header = Header.for_context(
+        ctx, timestamp=0, original_size=len(view), crc=zlib.crc32(view),
+        dictionary_id=dictionary.id if dictionary else None,
+    )
+    out.write(header.pack())
+    with lz.LZSSWriter(out, ctx) as lzss_out:
+        encode_blocks(
+            (view[i:i + BLOCK_SIZE] for i in range(0, len(view), BLOCK_SIZE)),
+            lzss_out, ctx, dictionary,
+        )
+
+def decompress_into(blob, buffer, dictionary=None) -> int:
+    """
+    Decompresses C{blob} (as returned by C{compress} or read from a
+    '.lzs' file) into the writable C{buffer}. Returns the number of
+    bytes written. Raises C{ValueError} if C{buffer} is too small.
+    """
+    out = BufferWriter(buffer)
+    with io.BytesIO(blob) as in_:
+        header = Header.read(in_)
+        if header.size_known and header.original_size > len(out):
+            raise ValueError(f'Buffer too small ({len(out)} bytes, {header.original_size} needed)')
+        return decode_stream(in_, out.write, header.context, header, dictionary=dictionary)
+
+def decompress(blob, dictionary=None) -> bytes:
+    """
+    Decompresses C{blob}, as returned by C{compress} or read from a
+    '.lzs' file. C{dictionary} is needed if C{blob} was compressed with
+    one.
+    """
+    with io.BytesIO(blob) as in_:
+        header = Header.read(in_)
+        if not header.size_known:
+            result = bytearray()
+            decode_stream(in_, result.extend, header.context, header, dictionary=dictionary)
+            return bytes(result)
+        # the size isn't checked until the data is decoded: don't
+        # allocate more than the data could possibly decode to
+        comp_size = memoryview(blob).nbytes - in_.tell()
+        if header.original_size > max_decoded_size(comp_size, header.context):
+            raise ChecksumError('The size in the header is larger than the data can decode to')
+        result = bytearray(header.original_size)
+        decode_stream(in_, BufferWriter(result).write, header.context, header, dictionary=dictionary)
+    return bytes(result)
+
+class PzypCompressor:
+    """
+    Compresses data given in pieces, like C{zlib.compressobj}. Each
+    call to C{compress} returns the compressed bytes that are ready
+    (maybe none), and C{flush} returns the rest. The compressed data is
+    the same as that of C{compress(data, level)}, however C{data} is
+    split, but the header has C{FLAG_NO_SIZE} since it's returned
+    before the data is known: the size and CRC-32 of the data are in a
+    trailer, returned by C{flush}.
+    """
+    def __init__(self, level=DEFAULT_LEVEL, dictionary=None):
+        ctx = level_context(level)
+        self._out = io.BytesIO()
+        header = Header.for_context(
+            ctx, timestamp=0, flags=FLAG_NO_SIZE | FLAG_TRAILER,
+            dictionary_id=dictionary.id if dictionary else None,
+        )
+        self._out.write(header.pack())
+        self._lzss_out = lz.LZSSWriter(self._out, ctx)
+        self._encoder = StreamEncoder(self._lzss_out, ctx, dictionary)
+        self._finished = False
+
+    def compress(self, data) -> bytes:
+        if self._finished:
+            raise ValueError('Compressor already flushed')
+        if data:
+            self._encoder.feed(memoryview(data).cast('B'))
+        return self._take()
+
+    def flush(self) -> bytes:
+        if self._finished:
+            raise ValueError('Compressor already flushed')
+        self._finished = True
+        self._encoder.finish()
+        self._lzss_out.close()
+        self._out.write(TRAILER.pack(self._encoder.size, self._encoder.crc))
+        return self._take()
+
+    def _take(self) -> bytes:
+        data = self._out.getvalue()
+        self._out.seek(0)
+        self._out.truncate()
+        return data
+
+class PzypDecompressor:
+    """
+    Decompresses data given in pieces, like C{zlib.decompressobj}: the
+    output of C{compress} or of C{PzypCompressor}, or the contents of a
+    '.lzs' file. Each call to C{decompress} returns the bytes decoded
+    so far. C{flush} checks that the stream ended properly (raises
+    C{LZSSReader.UnreadData} otherwise). Blocks are checked against
+    their CRC-32 as soon as they end, and the whole data against the
+    header or the trailer by C{flush} (C{ChecksumError}). Memory is bounded by the
+    window, the data of one call and, for files compressed in blocks,
+    the block table. C{dictionary} is needed for data compressed with
+    one.
+    """
+    def __init__(self, dictionary=None):
+        self._dictionary = dictionary
+        self._window = b''      # the window a sequential stream starts with
+        self._pending = b''     # input not yet handed over to a reader
+        self._ctx = None
+        self._table = None
+        self._blocks = None     # indexes of the blocks left
+        self._block_index = -1
+        self._block_left = 0    # compressed bytes left in the current block
+        self._total = 0         # bytes decoded by the finished readers
+        self._lzss_in = None
+        self._decoder = None
+        self.header = None
+        self.eof = False
+
+    def decompress(self, data) -> bytes:
+        if self.eof:
+            raise ValueError('Decompressor already flushed')
+        self._pending += data
+        result = bytearray()
+        self._process(result.extend, final=False)
+        return bytes(result)
+
+    def flush(self) -> bytes:
+        if self.eof:
+            return b''
+        result = bytearray()
+        self._process(result.extend, final=True)
+        if self._ctx is None:
+            raise ValueError('Missing header')
+        if self._blocks or self._block_left:
+            raise ValueError('Truncated data')
+        self._end_reader(result.extend)
+        if self._pending:
+            raise lz.LZSSReader.UnreadData('Unread compressed data in buffer.')
+        if self._table:
+            self.header.check(self._total)
+        self.eof = True
+        return bytes(result)
+
+    def _process(self, write, final: bool):
+        if self._ctx is None:
+            header_size = Header.packed_size(self._pending)
+            if not header_size or len(self._pending) < header_size:
+                return
+            self.header = Header.unpack(self._pending)
+            if self.header.encrypted:
+                raise DecryptionError('Encrypted data is not supported here')
+            self._window = self.header.preset(self._dictionary)
+            self._ctx = self.header.context
+            self._pending = self._pending[header_size:]
+        if self._blocks is None and self._lzss_in is None:
+            if not self._start(final):
+                return
+        if self._blocks is None:
+            # the last bytes may be the trailer: they wait for flush
+            keep = TRAILER.size if self.header.has_trailer else 0
+            cut = len(self._pending) - keep
+            if cut > 0:
+                self._decode(self._pending[:cut], write)
+                self._pending = self._pending[cut:]
+            return
+        while self._pending and (self._block_left or self._blocks):
+            if not self._block_left:
+                self._end_reader(write)
+                self._block_index = self._blocks.popleft()
+                self._block_left = self._table.entries[self._block_index][0]
+                self._new_reader()
+            data = self._pending[:self._block_left]
+            self._pending = self._pending[self._block_left:]
+            self._block_left -= len(data)
+            self._decode(data, write)
+
+    def _start(self, final: bool) -> bool:
+        """
+        Starts the reader of a sequential stream or, if the header has
+        C{FLAG_BLOCKS}, reads the block table that follows it. Returns
+        C{False} if more data is needed for the table.
+        """
+        if not self.header.blocks:
+            self._new_reader()
+            return True
+        pending = self._pending
+        if len(pending) < BLOCK_TABLE_HEAD.size:
+            if final:
+                raise ValueError('Truncated block table')
+            return False
+        head = pending[:BLOCK_TABLE_HEAD.size]
+        num_blocks = BlockTable.num_blocks(head)
+        table_size = BlockTable.packed_size(num_blocks)
+        if len(pending) < table_size:
+            if final:
+                raise ValueError('Truncated block table')
+            return False
+        self._table = BlockTable.unpack(head, pending[BLOCK_TABLE_HEAD.size:table_size])
+        self._blocks = deque(range(num_blocks))
+        self._pending = pending[table_size:]
+        self._window = b''
+        return True
+
+    def _new_reader(self):
+        self._lzss_in = lz.LZSSReader(None, self._ctx)
+        self._decoder = TokenDecoder(self._ctx.window_size, window=self._window)
+
+    def _decode(self, data, write):
+        self._decoder.decode(self._lzss_in.feed(data), write)
+        self._decoder.flush(write)
+
+    def _end_reader(self, write):
+        if self._lzss_in:
+            decoder = self._decoder
+            decoder.flush(write)
+            self._lzss_in.close()
+            self._lzss_in = self._decoder = None
+            self._total += decoder.total
+            if self._table:
+                self._table.check(self._block_index, decoder.total, decoder.crc)
+            else:
+                self.header.check(decoder.total, decoder.crc)
+                if self.header.has_trailer:
+                    self.header.check_trailer(self._pending, decoder.total, decoder.crc)
+                    self._pending = b''
+
+
+
+def _tokens_upto(lzss_in: lz.LZSSReader, end_bit):
+    """
+    Yields the tokens of C{lzss_in} until the one that ends at bit
+    C{end_bit} (C{None} means: until the end of the stream).
+    """
+    for token in lzss_in:
+        yield token
+        if end_bit is not None and lzss_in.bit_position >= end_bit:
+            return
+
+class PzypFile(io.RawIOBase):
+    """
+    A read-only, seekable file object over the original data of a
+    '.lzs' file, in the spirit of C{gzip.GzipFile}. Only the parts that
+    cover the requested range are decoded, and the last C{cache_size}
+    decoded parts are kept in an LRU cache.
+
+    Files compressed in parallel are split in independent blocks by
+    their C{BlockTable}. Sequential files are split with a side index,
+    built by decoding the file once and saved next to it (file name +
+    C{INDEX_EXTENSION}). Each entry of this index records where a part
+    starts in the compressed stream (in bits) and in the original data,
+    plus the window needed to resolve its first references.
+
+    Wrap it in C{io.BufferedReader} for an efficient C{readline}.
+    """
+    def __init__(self, file_name: str, cache_size=8, index_span=INDEX_SPAN):
+        super().__init__()
+        self.name = file_name
+        self._in = open(file_name, 'rb')
+        header = Header.read(self._in)
+        if header.encrypted:
+            raise DecryptionError(f'{file_name} is encrypted')
+        if header.dictionary_id is not None:
+            raise ValueError(f'{file_name} needs a preset dictionary')
+        self._ctx = header.context
+        table = BlockTable.read(self._in) if header.blocks else None
+        data_start = self._in.tell()
+        self._data_end = os.fstat(self._in.fileno()).st_size
+        if header.has_trailer:
+            self._data_end -= TRAILER.size
+        if table:
+            # (start bit, end bit, offset, size, window) of each part
+            self._parts = [
+                (offset * 8, (offset + size) * 8, out_offset, out_size, b'')
+                for offset, size, out_offset, out_size in table.offsets(data_start)
+            ]
+        else:
+            self._parts = self._load_index(data_start, index_span)
+        self._starts = [part[2] for part in self._parts]
+        self._size = sum(part[3] for part in self._parts)
+        self._pos = 0
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence=io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f'Invalid whence ({whence})')
+        if offset < 0:
+            raise ValueError(f'Negative seek position {offset}')
+        self._pos = offset
+        return offset
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        done = 0
+        while done < len(view) and self._pos < self._size:
+            index = bisect.bisect_right(self._starts, self._pos) - 1
+            data = self._part_data(index)
+            start = self._pos - self._starts[index]
+            count = min(len(view) - done, len(data) - start)
+            view[done:done + count] = data[start:start + count]
+            done += count
+            self._pos += count
+        return done
+
+    def close(self):
+        if not self.closed:
+            self._in.close()
+            self._cache.clear()
+        super().close()
+
+    def _part_data(self, index: int) -> bytes:
+        data = self._cache.get(index)
+        if data is not None:
+            self._cache.move_to_end(index)
+            return data
+        data = self._decode_part(index)
+        self._cache[index] = data
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return data
+
+    def _decode_part(self, index: int) -> bytes:
+        start_bit, end_bit, _, size, window = self._parts[index]
+        first_byte = start_bit // 8
+        self._in.seek(first_byte)
+        comp_data = self._in.read((-(-end_bit // 8) if end_bit else self._data_end) - first_byte)
+        lzss_in = lz.LZSSReader(io.BytesIO(comp_data), self._ctx, skip_bits=start_bit % 8)
+        data = bytearray()
+        decode_tokens(
+            _tokens_upto(lzss_in, end_bit and end_bit - first_byte * 8),
+            data.extend, self._ctx.window_size, chunk_size=size, window=window,
+        )
+        if len(data) != size:
+            raise ValueError(f'Part {index} of {self.name} decoded to {len(data)} bytes, expected {size}')
+        return bytes(data)
+
+    def _load_index(self, data_start: int, span: int):
+        index_name = self.name + INDEX_EXTENSION
+        stat = os.stat(self.name)
+        try:
+            with open(index_name, 'rb') as f:
+                magic, _, in_size, in_mtime, count = INDEX_HEAD.unpack(f.read(INDEX_HEAD.size))
+                if magic == INDEX_MAGIC and (in_size, in_mtime) == (stat.st_size, stat.st_mtime_ns):
+                    entries = []
+                    for _ in range(count):
+                        start_bit, offset, size, window_len = INDEX_ENTRY.unpack(
+                            f.read(INDEX_ENTRY.size)
+                        )
+                        entries.append((start_bit, offset, size, f.read(window_len)))
+                    return self._parts_from(entries)
+        except (OSError, struct.error):
+            pass
+        entries = self._build_index(data_start, span)
+        try:
+            with open(index_name, 'wb') as f:
+                f.write(INDEX_HEAD.pack(INDEX_MAGIC, span, stat.st_size, stat.st_mtime_ns, len(entries)))
+                for start_bit, offset, size, window in entries:
+                    f.write(INDEX_ENTRY.pack(start_bit, offset, size, len(window)))
+                    f.write(window)
+        except OSError:
+            pass    # the index is just a cache
+        return self._parts_from(entries)
+
+    @staticmethod
+    def _parts_from(entries):
+        ends = [entry[0] for entry in entries[1:]] + [None]
+        return [
+            (start_bit, end_bit, offset, size, window)
+            for (start_bit, offset, size, window), end_bit in zip(entries, ends)
+        ]
+
+    def _build_index(self, data_start: int, span: int):
+        """
+        Decodes the whole file, recording an entry C{(start bit, offset,
+        size, window)} at the first token boundary after every C{span}
+        bytes of original data.
+        """
+        window_size = self._ctx.window_size
+        entries = []
+        part_bit, part_offset, part_window = data_start * 8, 0, b''
+        buffer = bytearray()
+        offset = 0          # original data offset of buffer[0]
+        self._in.seek(data_start)
+        comp_in = TrailerReader(self._in, os.fstat(self._in.fileno()).st_size - self._data_end)
+        with lz.LZSSReader(comp_in, self._ctx) as lzss_in:
+            for encoded_flag, element in lzss_in:
+                if encoded_flag:
+                    pos, length = element
+                    start = len(buffer) - pos
+                    if length <= pos:
+                        buffer += buffer[start:start + length]
+                    else:
+                        buffer += (buffer[start:] * (length // pos + 1))[:length]
                 else:
-                    result += element.strip(b'\r')
-                    window.extend(element)
-                    output = window.get_dict()
-        
+                    buffer += element
+                if offset + len(buffer) - part_offset >= span:
+                    end = offset + len(buffer)
+                    entries.append((part_bit, part_offset, end - part_offset, part_window))
+                    part_bit = data_start * 8 + lzss_in.bit_position
+                    part_offset = end
+                    part_window = bytes(buffer[-window_size:])
+                    offset += len(buffer) - len(part_window)
+                    buffer = bytearray(part_window)
+        end = offset + len(buffer)
+        if end > part_offset or not entries:
+            entries.append((part_bit, part_offset, end - part_offset, part_window))
+        return entries
 
-        out.write(result.decode(ENCODING))
+@contextmanager
+def replacing(path: str):
+    """
+    Yields a temporary file name in the directory of C{path}, for the
+    block to create, that replaces C{path} if the block succeeds and is
+    removed if it doesn't. A file that fails to decode (wrong password,
+    bad CRC-32) never overwrites an existing one. The file is created
+    by the block, so it gets the usual permissions.
+    """
+    head, tail = os.path.split(path)
+    temp_path = os.path.join(head, f'.{tail}.{os.urandom(4).hex()}.tmp')
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
 
+def decode_file(in_path: str, out_path=None, password=None, dictionary=None, jobs=None,
+                mapped=False, progress=None, stats=None) -> str:
+    """
+    Decodes the file C{in_path} into C{out_path} (by default, the name
+    in its header), in parallel with C{jobs} processes or memory mapped
+    if it can be (see C{decode_parallel} and C{decode_mapped}). The
+    output is written with C{replacing}, and a missing password is
+    reported before it's created. Returns the name of the output file.
+    """
+    start = time.perf_counter()
+    with open(in_path, 'rb') as in_:
+        header = Header.read(in_)
+        if header.encrypted and not password:
+            raise DecryptionError('The data is encrypted and no password was given')
+        out_path = out_path or header.name
+        with replacing(out_path) as temp_path:
+            if jobs is not None and decode_parallel(in_path, temp_path, jobs):
+                if stats:
+                    stats.add_files(in_path, temp_path, start)
+                return out_path
+            if not (mapped and decode_mapped(in_, temp_path, header, stats)):
+                with open(temp_path, 'wb') as out:
+                    decode_stream(
+                        in_, out.write, header.context, header, password, dictionary,
+                        progress=progress, stats=stats,
+                    )
+    return out_path
 
+def verify(file_name: str, password=None, dictionary=None, stats=None) -> bool:
+    """
+    Decodes C{file_name} without writing the result, checking the CRCs
+    of its blocks and of the whole data (and the authentication of the
+    encrypted frames). Prints and returns the result.
+    """
+    try:
+        with open(file_name, 'rb') as in_:
+            header = Header.read(in_)
+            size = decode_stream(
+                in_, lambda data: None, header.context, header, password, dictionary, stats=stats,
+            )
+    except (ValueError, lz.LZSSReader.UnreadData) as ex:
+        print(f'{file_name}: FAILED ({ex})')
+        return False
+    checked = 'CRC-32 OK' if header.size_known or header.has_trailer else 'no CRC-32 in the header'
+    print(f'{file_name}: {size} bytes, {checked}')
+    return True
 
 def main():
-    ctx = lz.PZYPContext(
-        encoded_offset_size=LEVEL[int(ARGS['--comprlevel'])][0],
-        encoded_len_size=LEVEL[int(ARGS['--comprlevel'])][1]  
-    )
+    from docopt import docopt
+    args = docopt(__doc__)
+    ctx = level_context(int(args['--comprlevel']))
+    dictionary = Dictionary.load(args['--dict']) if args['--dict'] else None
+    stats = Stats() if args['--stats'] else None
+    start = time.perf_counter()
    
-    if ARGS['--compress']:
-        fileN = get_fileName(ARGS['FILE'])
-        with open(ARGS['FILE'], 'rb') as in_:
-            with open(f"{fileN}.{FILE_EXTENTION}", 'ab') as out:
-                compressLevel = int(ARGS['--comprlevel'])
-                if compressLevel != 2:
-                    encode(in_, out, None, ctx)
+    if args['train']:
+        samples = []
+        for path in args['SAMPLE']:
+            with open(path, 'rb') as in_:
+                samples.append(in_.read())
+        dictionary = Dictionary(train_dictionary(samples, int(args['--size'])))
+        dictionary.save(args['DICT'])
+        print(f"Dictionary {dictionary.id:08x} ({len(dictionary.data)} bytes) saved [{args['DICT']}]")
+    elif args['--compress']:
+        fileN = get_fileName(args['FILE'])
+        with open(args['FILE'], 'rb') as in_:
+            with open(f"{fileN}.{FILE_EXTENTION}", 'wb') as out:
+                # encrypted files and files with a dictionary are always sequential
+                parallel = args['--jobs'] is not None and not args['--password'] and not dictionary
+                if parallel:
+                    encode_parallel(in_, out, int(args['--jobs']), ctx)
                 else:
-                    encode(in_, out)
-                if(ARGS['--password']):                    
-                    password = ARGS['--password']
-                    fileToEncrypt = openFile(f"{fileN}.{FILE_EXTENTION}")
-                    genwrite_key(fileN, password)
-                    key = call_key(fileN)
-                    encripter = Fernet(key)
-                    encriptedFile = encripter.encrypt(fileToEncrypt)
-                    #para apagar o conteudo antigo
-                    out.truncate(0)
-                    #guardar conteudo encriptado
-                    out.write(encriptedFile)
+                    encode(
+                        in_, out, None, ctx, args['--password'], dictionary,
+                        stats=stats, mapped=args['--mmap'],
+                    )
+        if stats and parallel:
+            stats.add_files(args['FILE'], f"{fileN}.{FILE_EXTENTION}", start)
         print(f"File is compressed [{fileN}.{FILE_EXTENTION}]")
-    elif ARGS['--decompress']:
-        if '.lzs' not in ARGS['FILE']:
+    elif args['--decompress']:
+        if '.lzs' not in args['FILE']:
                     print("File is not compressed, please try again")
                     sys.exit()
         else:
-            with open(ARGS['FILE'], 'rb') as in_:
-                    head = in_.readline().split()
-                    fn=head[3].decode(ENCODING)
-                    oNl=[int(head[0]), int(head[1])]
-                    with open(fn, 'w+') as out:
-                        decode(in_, out, oNl)
+            jobs = args['--jobs']
+            try:
+                decode_file(
+                    args['FILE'], None, args['--password'], dictionary,
+                    None if jobs is None else int(jobs), args['--mmap'], stats=stats,
+                )
+            except (ValueError, lz.LZSSReader.UnreadData) as ex:
+                print(f"{args['FILE']}: FAILED ({ex})")
+                sys.exit(1)
+    elif args['--archive'] or args['--extract'] or args['--list']:
+        import pzyp_archive
+        if args['--archive']:
+            jobs = args['--jobs']
+            members = pzyp_archive.create_archive(
+                args['ARCHIVE'], args['PATH'], int(args['--comprlevel']),
+                None if jobs is None else int(jobs),
+            )
+            print(f"{len(members)} files packed into [{args['ARCHIVE']}]")
+        else:
+            with pzyp_archive.PzypArchive(args['ARCHIVE']) as archive:
+                if args['--list']:
+                    archive.list()
+                else:
+                    archive.extract('.', args['MEMBER'] or None)
+    elif args['--verify']:
+        if not verify(args['FILE'], args['--password'], dictionary, stats):
+            sys.exit(1)
     else:
+        import desktop_app1 as mw
         mw.PzypMainWindow.run_app()
 
-    if ARGS['--sumary']:
-        fileName = ARGS['FILE']
+    if args['--sumary']:
+        fileName = args['FILE']
         if '.lzs' not in fileName:
             print("File is not compressed, please try again")
             sys.exit()
         else:
             head_reader(fileName)
+
+    if stats:
+        import json
+        print(json.dumps(stats.summary(), indent=2))
         
 
 if __name__ == '__main__':
@@ -0,0 +1,264 @@
+"""
+Archives: many files packed in a single '.pza' file.
+
+The contents of all the members, one after the other, make a single
+stream that is split in solid blocks of C{SOLID_BLOCK_SIZE} bytes, so
+that small files share the compression window. Each block is an
+independent LZSS stream, so blocks can be compressed in parallel and a
+member can be read by decoding only the blocks it spans.
+
+Layout:
+    ARCHIVE_HEAD        magic, version, level, window and length bits,
+                        where the central directory starts
+    blocks              compressed data
+    central directory   a C{pzyp.BlockTable} (with the CRC-32 of each
+                        block) followed by one C{MEMBER_ENTRY} and
+                        name (UTF-8) per member
+
+The directory is at the end since it's only complete once all the
+blocks have been written; its offset is patched into the head.
+"""
+
+import io
+import os
+import struct
+import time
+import zlib
+from typing import BinaryIO
+
+import lzss_io as lz
+import pzyp as pz
+
+
+__all__ = [
+    'ARCHIVE_EXTENSION',
+    'create_archive',
+    'PzypArchive',
+]
+
+ARCHIVE_EXTENSION = 'pza'
+ARCHIVE_MAGIC = b'PZYA'
+ARCHIVE_VERSION = 1
+ARCHIVE_HEAD = struct.Struct('<4sBBBBQ')    # magic, version, level, window bits,
+                                            # length bits, directory offset
+MEMBERS_HEAD = struct.Struct('<I')          # number of members
+MEMBER_ENTRY = struct.Struct('<QQIqH')      # offset, size, CRC-32, mtime (ns),
+                                            # name size
+SOLID_BLOCK_SIZE = 1024 * 1024
+READ_SIZE = 64 * 1024
+
+
+class Member:
+    """
+    A file in an archive: its name (relative, with '/' separators),
+    where its data starts in the uncompressed stream, its size, the
+    CRC-32 of its data and its modification time (in nanoseconds).
+    """
+    def __init__(self, name: str, offset: int, size: int, crc: int, mtime_ns: int):
+        self.name = name
+        self.offset = offset
+        self.size = size
+        self.crc = crc
+        self.mtime_ns = mtime_ns
+
+    def pack(self) -> bytes:
+        name = self.name.encode(pz.ENCODING)
+        return MEMBER_ENTRY.pack(self.offset, self.size, self.crc, self.mtime_ns, len(name)) + name
+
+    @classmethod
+    def read(cls, in_: BinaryIO):
+        offset, size, crc, mtime_ns, name_size = MEMBER_ENTRY.unpack(in_.read(MEMBER_ENTRY.size))
+        return cls(in_.read(name_size).decode(pz.ENCODING), offset, size, crc, mtime_ns)
+#:
+
+def walk(paths, exclude=None):
+    """
+    Yields C{(file path, member name)} for the files in C{paths} (files
+    or directories, searched recursively, in name order). Names are
+    relative to the parent of each path, as with 'tar'. A name already
+    yielded (a path given twice) and the file C{exclude} (the archive
+    being written, which must exist) are skipped, as 'tar' does.
+    """
+    excluded = os.stat(exclude) if exclude else None
+    names = set()
+    for file_path, name in _walk(paths):
+        if name not in names and not is_same(file_path, excluded):
+            names.add(name)
+            yield file_path, name
+
+def _walk(paths):
+    for path in paths:
+        base = os.path.dirname(os.path.abspath(path))
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    file_path = os.path.join(dir_path, file_name)
+                    if os.path.isfile(file_path):
+                        yield file_path, member_name(file_path, base)
+        else:
+            yield path, member_name(path, base)
+
+def is_same(path: str, stat) -> bool:
+    return stat is not None and os.path.samestat(os.stat(path), stat)
+
+def member_name(path: str, base: str) -> str:
+    return os.path.relpath(os.path.abspath(path), base).replace(os.sep, '/')
+
+def create_archive(archive_path: str, paths, level=pz.DEFAULT_LEVEL, jobs=None,
+                   block_size=SOLID_BLOCK_SIZE) -> list:
+    """
+    Packs the files in C{paths} into a new archive. With C{jobs}, the
+    blocks are compressed by that many processes (0: one per CPU).
+    Returns the list of C{Member}s.
+    """
+    ctx = pz.level_context(level)
+    members = []
+
+    def solid_blocks():
+        """
+        The contents of all the files, one after the other, in blocks of
+        C{block_size} bytes.
+        """
+        block = bytearray()
+        offset = 0
+        for file_path, name in walk(paths, exclude=archive_path):
+            crc = size = 0
+            with open(file_path, 'rb') as in_:
+                mtime_ns = os.fstat(in_.fileno()).st_mtime_ns
+                for data in pz.read_blocks(in_, READ_SIZE):
+                    crc = zlib.crc32(data, crc)
+                    size += len(data)
+                    block += data
+                    while len(block) >= block_size:
+                        yield bytes(block[:block_size])
+                        del block[:block_size]
+            members.append(Member(name, offset, size, crc, mtime_ns))
+            offset += size
+        if block:
+            yield bytes(block)
+
+    table = pz.BlockTable(block_size)
+    with open(archive_path, 'wb') as out:
+        out.write(bytes(ARCHIVE_HEAD.size))
+        for size, crc, comp_data in pz.compress_blocks(solid_blocks(), jobs, ctx):
+            out.write(comp_data)
+            table.entries.append((len(comp_data), size, crc))
+        directory_pos = out.tell()
+        table.write(out)
+        out.write(MEMBERS_HEAD.pack(len(members)))
+        out.write(b''.join(member.pack() for member in members))
+        out.seek(0)
+        out.write(ARCHIVE_HEAD.pack(
+            ARCHIVE_MAGIC, ARCHIVE_VERSION, level,
+            ctx.encoded_offset_size, ctx.encoded_len_size, directory_pos,
+        ))
+    return members
+#:
+
+class PzypArchive:
+    """
+    Reads an archive made by C{create_archive}. Only the head and the
+    central directory are read when it's opened; the data of a member
+    is decoded from the blocks it spans (the last decoded block is
+    kept, so members read in order decode each block once).
+    """
+    def __init__(self, archive_path: str):
+        self.name = archive_path
+        self._in = open(archive_path, 'rb')
+        magic, version, self.level, window_bits, len_bits, directory_pos = (
+            ARCHIVE_HEAD.unpack(self._in.read(ARCHIVE_HEAD.size))
+        )
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError(f'{archive_path} is not a PZYP archive')
+        if version != ARCHIVE_VERSION:
+            raise ValueError(f'Unsupported archive version {version}')
+        self._ctx = lz.PZYPContext(encoded_offset_size=window_bits, encoded_len_size=len_bits)
+        self._in.seek(directory_pos)
+        self._table = pz.BlockTable.read(self._in)
+        num_members, = MEMBERS_HEAD.unpack(self._in.read(MEMBERS_HEAD.size))
+        self.members = [Member.read(self._in) for _ in range(num_members)]
+        self._by_name = {member.name: member for member in self.members}
+        self._blocks = list(self._table.offsets(ARCHIVE_HEAD.size))
+        self._cached = (None, b'')
+
+    def member(self, name: str) -> Member:
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise KeyError(f'{name} is not in {self.name}') from None
+
+    def read(self, name: str) -> bytes:
+        """
+        The data of member C{name}, checked against its CRC-32.
+        """
+        return b''.join(self._member_data(self.member(name)))
+
+    def extract(self, dest_dir='.', names=None):
+        """
+        Writes the members C{names} (all by default) under C{dest_dir},
+        with their modification times. Names that would end up outside
+        C{dest_dir} are rejected. Each member is written a block at a
+        time, to a temporary file that only takes its name once the
+        CRC-32 has been checked.
+        """
+        members = self.members if names is None else [self.member(name) for name in names]
+        for member in sorted(members, key=lambda member: member.offset):
+            path = safe_path(dest_dir, member.name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with pz.replacing(path) as temp_path:
+                with open(temp_path, 'wb') as out:
+                    for data in self._member_data(member):
+                        out.write(data)
+                os.utime(temp_path, ns=(member.mtime_ns, member.mtime_ns))
+
+    def list(self):
+        for member in self.members:
+            mtime = time.strftime('%Y-%m-%d %H:%M', time.localtime(member.mtime_ns / 1e9))
+            print(f'{member.size:>12} {mtime} {member.name}')
+
+    def _member_data(self, member: Member):
+        """
+        Yields the data of C{member}, a piece of each block it spans,
+        then raises C{ChecksumError} if it doesn't match its CRC-32.
+        """
+        block_size = self._table.block_size
+        end = member.offset + member.size
+        crc = 0
+        for index in range(member.offset // block_size, -(-end // block_size)):
+            block_start = index * block_size
+            data = memoryview(self._block(index))[
+                max(member.offset - block_start, 0):end - block_start
+            ]
+            crc = zlib.crc32(data, crc)
+            yield data
+        if crc != member.crc:
+            raise pz.ChecksumError(f'{member.name} is corrupted')
+
+    def _block(self, index: int) -> bytes:
+        if self._cached[0] == index:
+            return self._cached[1]
+        offset, comp_size, _, _ = self._blocks[index]
+        self._in.seek(offset)
+        data = bytearray()
+        with lz.LZSSReader(io.BytesIO(self._in.read(comp_size)), self._ctx) as lzss_in:
+            pz.decode_tokens(lzss_in, data.extend, self._ctx.window_size)
+        self._table.check(index, len(data), zlib.crc32(data))
+        self._cached = (index, data)
+        return data
+
+    def close(self):
+        self._in.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+#:
+
+def safe_path(dest_dir: str, name: str) -> str:
+    parts = name.split('/')
+    if name.startswith('/') or '..' in parts or (parts and ':' in parts[0]):
+        raise ValueError(f'Unsafe member name {name!r}')
+    return os.path.join(dest_dir, *parts)
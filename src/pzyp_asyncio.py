@@ -0,0 +1,72 @@
+"""
+asyncio support for PZYP: compresses and decompresses the data of an
+C{asyncio.StreamReader} into an C{asyncio.StreamWriter} (or anything
+with C{write} and a C{drain} coroutine). A single event loop can serve
+many streams at once.
+
+The coding itself is done by C{pzyp.PzypCompressor} and
+C{pzyp.PzypDecompressor} in an executor (the loop's default one unless
+another is given), one chunk at a time, so the loop is never blocked by
+it. Each chunk is drained before the next is read, so a slow consumer
+slows down the producer instead of filling memory.
+"""
+
+import asyncio
+
+import pzyp as pz
+
+
+__all__ = [
+    'compress_stream',
+    'decompress_stream',
+]
+
+CHUNK_SIZE = pz.BLOCK_SIZE  # bytes read from the stream at a time
+
+
+async def compress_stream(
+        reader: asyncio.StreamReader,
+        writer,
+        level=pz.DEFAULT_LEVEL,
+        chunk_size=CHUNK_SIZE,
+        executor=None,
+) -> int:
+    """
+    Compresses the data of C{reader}, until its end, into C{writer}.
+    The output is that of C{pzyp.PzypCompressor}. C{writer} isn't
+    closed.
+    Returns the number of bytes read.
+    """
+    compressor = pz.PzypCompressor(level)
+    return await _pump(reader, writer, compressor.compress, compressor.flush, chunk_size, executor)
+
+async def decompress_stream(
+        reader: asyncio.StreamReader,
+        writer,
+        chunk_size=CHUNK_SIZE,
+        executor=None,
+) -> int:
+    """
+    Decompresses the data of C{reader} (as written by C{compress_stream}
+    or C{pzyp.compress}) into C{writer}, which isn't closed. Raises
+    C{LZSSReader.UnreadData} or C{ValueError} if the data ends where it
+    shouldn't. Returns the number of bytes read.
+    """
+    decompressor = pz.PzypDecompressor()
+    return await _pump(reader, writer, decompressor.decompress, decompressor.flush, chunk_size, executor)
+
+async def _pump(reader, writer, process, flush, chunk_size: int, executor) -> int:
+    loop = asyncio.get_running_loop()
+    total = 0
+    while chunk := await reader.read(chunk_size):
+        total += len(chunk)
+        data = await loop.run_in_executor(executor, process, chunk)
+        if data:
+            writer.write(data)
+            await writer.drain()
+    data = await loop.run_in_executor(executor, flush)
+    if data:
+        writer.write(data)
+    await writer.drain()
+    return total
+#:
@@ -260,10 +260,11 @@ def dump_objs(objs_iter, dump_fn=json.dumps):
     return '[%s]' % ','.join((dump_fn(obj) for obj in objs_iter))
 
 
-def gen_unique_path_from(path_: str) -> str:
+def gen_unique_path_from(path_: str, taken=()) -> str:
     """
     Generates a unique file path from C{path_} if the given 
-    {path_} exists. Otherwise, just returns that path.
+    {path_} exists or is in C{taken} (paths about to be created).
+    Otherwise, just returns that path.
     Returns a C{str} with the new unique path.
     """
     if not path_:
@@ -271,7 +272,7 @@ def gen_unique_path_from(path_: str) -> str:
     path_ext = pathlib.Path(path_).suffix
     path_and_name = path_.partition(path_ext)[0] if path_ext else path_
     i = 2
-    while os.path.exists(path_):
+    while os.path.exists(path_) or path_ in taken:
         path_ = f'{path_and_name}_{i}{path_ext}'
         i += 1
     return path_
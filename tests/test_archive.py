@@ -0,0 +1,69 @@
+import os
+import random
+
+import pytest
+
+import pzyp as pz
+import pzyp_archive as pa
+
+
+def make_tree(root: str) -> dict:
+    rnd = random.Random(0)
+    files = {}
+    os.makedirs(os.path.join(root, 'src', 'sub'))
+    for i in range(20):
+        path = os.path.join(root, 'src', 'sub' if i % 2 else '', f'f{i}.bin')
+        data = rnd.randbytes(i * 1000) + b'abc' * (i * 5000)
+        with open(path, 'wb') as out:
+            out.write(data)
+        files[os.path.relpath(path, root).replace(os.sep, '/')] = data
+    return files
+
+def test_roundtrip(tmp_path):
+    files = make_tree(str(tmp_path))
+    archive_path = str(tmp_path / 'a.pza')
+    pa.create_archive(archive_path, [str(tmp_path / 'src')], 2, block_size=100_000)
+    out = tmp_path / 'out'
+    with pa.PzypArchive(archive_path) as archive:
+        assert sorted(member.name for member in archive.members) == sorted(files)
+        for name, data in files.items():
+            assert archive.read(name) == data
+        archive.extract(str(out))
+    for name, data in files.items():
+        assert (out / name).read_bytes() == data
+
+def test_corrupted_member(tmp_path):
+    files = make_tree(str(tmp_path))
+    archive_path = str(tmp_path / 'a.pza')
+    members = pa.create_archive(archive_path, [str(tmp_path / 'src')], 2, block_size=100_000)
+    # a wrong CRC-32 in the directory: the blocks decode fine
+    member = max(members, key=lambda member: member.size)
+    with open(archive_path, 'r+b') as f:
+        data = f.read()
+        entry = member.pack()
+        pos = data.index(entry)
+        f.seek(pos + 16)   # after the offset and the size
+        f.write((member.crc ^ 1).to_bytes(4, 'little'))
+    with pa.PzypArchive(archive_path) as archive:
+        with pytest.raises(pz.ChecksumError):
+            archive.read(member.name)
+        with pytest.raises(pz.ChecksumError):
+            archive.extract(str(tmp_path / 'out'), [member.name])
+        assert not os.listdir(tmp_path / 'out' / os.path.dirname(member.name))
+        assert archive.read(members[0].name) == files[members[0].name]
+
+def test_archive_inside_path(tmp_path):
+    files = make_tree(str(tmp_path))
+    archive_path = str(tmp_path / 'src' / 'a.pza')
+    members = pa.create_archive(archive_path, [str(tmp_path / 'src')], 1, block_size=100_000)
+    assert sorted(member.name for member in members) == sorted(files)
+    with pa.PzypArchive(archive_path) as archive:
+        for name, data in files.items():
+            assert archive.read(name) == data
+
+def test_duplicate_paths(tmp_path):
+    files = make_tree(str(tmp_path))
+    src = str(tmp_path / 'src')
+    archive_path = str(tmp_path / 'a.pza')
+    members = pa.create_archive(archive_path, [src, src], 1)
+    assert sorted(member.name for member in members) == sorted(files)
@@ -0,0 +1,83 @@
+import asyncio
+import random
+import socket
+
+import pytest
+
+import pzyp as pz
+import pzyp_asyncio
+
+
+async def roundtrip(i: int, data: bytes) -> bytes:
+    """
+    The data is compressed into a local socket pair, decompressed from
+    it into a second one, and read back from there.
+    """
+    source = asyncio.StreamReader()
+    source.feed_data(data)
+    source.feed_eof()
+
+    comp_sock1, comp_sock2 = socket.socketpair()
+    dec_sock1, dec_sock2 = socket.socketpair()
+    _, comp_writer = await asyncio.open_connection(sock=comp_sock1)
+    comp_reader, comp_writer2 = await asyncio.open_connection(sock=comp_sock2)
+    _, dec_writer = await asyncio.open_connection(sock=dec_sock1)
+    result_reader, result_writer = await asyncio.open_connection(sock=dec_sock2)
+
+    async def compress_side():
+        await pzyp_asyncio.compress_stream(source, comp_writer, level=1 + i % 9, chunk_size=997 + i)
+        comp_writer.close()
+
+    async def decompress_side():
+        try:
+            await pzyp_asyncio.decompress_stream(comp_reader, dec_writer, chunk_size=4096 - i)
+        finally:
+            dec_writer.close()
+
+    try:
+        _, _, result = await asyncio.gather(
+            compress_side(), decompress_side(), result_reader.read(),
+        )
+    finally:
+        comp_writer2.close()
+        result_writer.close()
+    return result
+
+def test_concurrent_streams():
+    """
+    All the streams run at once, in the same event loop.
+    """
+    rnd = random.Random(0)
+    words = [rnd.randbytes(rnd.randint(1, 8)) for _ in range(200)]
+    streams = [b' '.join(rnd.choices(words, k=rnd.randint(0, 5_000))) for _ in range(12)]
+
+    async def run():
+        return await asyncio.gather(*(roundtrip(i, data) for i, data in enumerate(streams)))
+
+    assert asyncio.run(run()) == streams
+
+def test_corrupted_stream():
+    data = b'a few words, a few more words. ' * 1000
+    compressor = pz.PzypCompressor(2)
+    blob = bytearray(compressor.compress(data) + compressor.flush())
+    blob[-5] ^= 0x01
+
+    async def run():
+        source = asyncio.StreamReader()
+        source.feed_data(bytes(blob))
+        source.feed_eof()
+        sink = Sink()
+        await pzyp_asyncio.decompress_stream(source, sink)
+
+    with pytest.raises(pz.ChecksumError):
+        asyncio.run(run())
+
+class Sink:
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
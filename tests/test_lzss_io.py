@@ -0,0 +1,70 @@
+import io
+
+import pytest
+
+import lzss_io as lz
+
+
+CONTEXTS = [(10, 4), (12, 4), (15, 5)]
+
+
+def tokens(ctx, count: int) -> list:
+    return [
+        bytes((i % 256,)) if i % 3 else (i % ctx.window_size or 1, ctx.min_string_size + i % 5)
+        for i in range(count)
+    ]
+
+def write(ctx, tokens, many=False) -> bytes:
+    with io.BytesIO() as out:
+        with lz.LZSSWriter(out, ctx=ctx) as writer:
+            if many:
+                writer.write_many(tokens)
+            else:
+                for token in tokens:
+                    writer.write(token)
+        return out.getvalue()
+
+@pytest.mark.parametrize('offset_size, len_size', CONTEXTS)
+def test_writer_reader_roundtrip(offset_size, len_size):
+    ctx = lz.PZYPContext(encoded_offset_size=offset_size, encoded_len_size=len_size)
+    written = tokens(ctx, 5000)
+    with lz.LZSSReader(io.BytesIO(write(ctx, written)), ctx) as reader:
+        read = [element for _, element in reader]
+    assert read == written
+
+@pytest.mark.parametrize('offset_size, len_size', CONTEXTS)
+def test_write_many_same_as_write(offset_size, len_size):
+    ctx = lz.PZYPContext(encoded_offset_size=offset_size, encoded_len_size=len_size)
+    written = tokens(ctx, 5000)
+    assert write(ctx, written, many=True) == write(ctx, written)
+
+@pytest.mark.parametrize('size', [2, 3, 7, 8, 9, 15, 16, 17, 31, 100, 1000])
+def test_literal_run_same_as_literals(size):
+    ctx = lz.PZYPContext()
+    run = bytes(range(256)) * (size // 256 + 1)
+    run = run[:size]
+    packed = [(1, ctx.min_string_size), lz.LiteralRun(run), b'x']
+    single = [(1, ctx.min_string_size)] + [bytes((byte,)) for byte in run] + [b'x']
+    assert write(ctx, packed, many=True) == write(ctx, single)
+
+@pytest.mark.parametrize('offset_size, len_size', CONTEXTS)
+def test_writer_buffer_is_bounded(offset_size, len_size):
+    """
+    The writer buffer must never hold much more than the high water
+    mark, whatever the token sizes (9, 17 or 21 bits).
+    """
+    ctx = lz.PZYPContext(encoded_offset_size=offset_size, encoded_len_size=len_size)
+    limit = 1000
+    with io.BytesIO() as out:
+        with lz.LZSSWriter(out, ctx=ctx, high_water_mark=limit) as writer:
+            max_bits = 0
+            for i in range(50_000):
+                if i % 3:
+                    writer.write(bytes((i % 256,)))
+                else:
+                    writer.write((i % ctx.window_size, ctx.min_string_size))
+                max_bits = max(max_bits, len(writer.buffer))
+            writer.write_many([b'x', (1, ctx.min_string_size)] * 10_000)
+            max_bits = max(max_bits, len(writer.buffer))
+        assert max_bits < limit + 1 + ctx.encoded_string_size
+        assert out.getvalue()
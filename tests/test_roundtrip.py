@@ -0,0 +1,387 @@
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tracemalloc
+
+import pytest
+
+import lzss_io as lz
+import pzyp as pz
+
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PZYP = os.path.join(TESTS_DIR, '..', 'src', 'pzyp.py')
+SIZES = [0, 1, 2, 17, 255, 4096, 65_535, 65_537]
+
+
+def gen_binary(size: int, seed=1234) -> bytes:
+    """
+    Random bytes with repeated runs, so that the data has references
+    (that may overlap) as well as literals.
+    """
+    rnd = random.Random(seed)
+    data = bytearray()
+    while len(data) < size:
+        if data and rnd.random() < 0.5:
+            start = rnd.randrange(len(data))
+            data += data[start:start + rnd.randint(1, 40)]
+        else:
+            data += rnd.randbytes(rnd.randint(1, 20))
+    return bytes(data[:size])
+
+def chunks(data: bytes, seed=0):
+    rnd = random.Random(seed)
+    pos = 0
+    while pos < len(data):
+        size = rnd.choice([0, 1, 7, 100, 5000, 70_000])
+        yield data[pos:pos + size]
+        pos += size
+
+class Pipe(io.RawIOBase):
+    """
+    A stream that can't seek (nor tell), like a pipe.
+    """
+    def __init__(self, data=b''):
+        super().__init__()
+        self._buffer = io.BytesIO(data)
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        return self._buffer.readinto(buffer)
+
+    def write(self, data) -> int:
+        return self._buffer.write(data)
+
+    def getvalue(self) -> bytes:
+        return self._buffer.getvalue()
+
+def decode_all(blob: bytes, password=None) -> bytes:
+    in_ = Pipe(blob)
+    header = pz.Header.read(in_)
+    out = bytearray()
+    pz.decode_stream(in_, out.extend, header.context, header, password)
+    return bytes(out)
+
+
+@pytest.mark.parametrize('level', range(1, 10))
+def test_compress_roundtrip(level):
+    for size in SIZES if level < 8 else SIZES[:-2]:
+        data = gen_binary(size, seed=size)
+        assert pz.decompress(pz.compress(data, level)) == data
+
+@pytest.mark.parametrize('level', [1, 4, 8])
+def test_file_roundtrip(tmp_path, level):
+    data = gen_binary(300_000)
+    in_path, out_path = tmp_path / 'data.bin', tmp_path / 'data.lzs'
+    in_path.write_bytes(data)
+    pz.encode(str(in_path), str(out_path), None, pz.level_context(level))
+    with open(out_path, 'rb') as in_:
+        header = pz.Header.read(in_)
+        assert (header.original_size, header.name) == (len(data), str(in_path))
+        with io.BytesIO() as out:
+            assert pz.decode_stream(in_, out.write, header.context, header) == len(data)
+            assert out.getvalue() == data
+
+def test_old_text_header():
+    with open(os.path.join(TESTS_DIR, 'teste.lzs'), 'rb') as in_:
+        data = pz.decompress(in_.read())
+    with open(os.path.join(TESTS_DIR, 'teste.txt'), 'rb') as in_:
+        assert data.replace(b'\r\n', b'\n') == in_.read()
+
+def test_mapped(tmp_path):
+    data = gen_binary(300_000)
+    in_path = tmp_path / 'data.bin'
+    in_path.write_bytes(data)
+    blobs = []
+    for mapped in (False, True):
+        out_path = tmp_path / f'data{mapped}.lzs'
+        pz.encode(str(in_path), str(out_path), None, pz.level_context(2), mapped=mapped)
+        blobs.append(out_path.read_bytes())
+    # the headers only differ in the timestamp
+    header_size = pz.Header.packed_size(blobs[0])
+    assert blobs[0][header_size:] == blobs[1][header_size:]
+    with open(tmp_path / 'blocks.lzs', 'wb') as out, open(in_path, 'rb') as in_:
+        pz.encode_parallel(in_, out, 1, pz.level_context(2), block_size=70_000)
+    for name in ('dataTrue.lzs', 'blocks.lzs'):
+        with open(tmp_path / name, 'rb') as in_:
+            header = pz.Header.read(in_)
+            assert pz.decode_mapped(in_, str(tmp_path / 'out.bin'), header)
+        assert (tmp_path / 'out.bin').read_bytes() == data
+    out = Pipe()
+    pz.encode(io.BytesIO(data), out, None, pz.level_context(2))
+    in_ = io.BytesIO(out.getvalue())
+    assert not pz.decode_mapped(in_, str(tmp_path / 'none.bin'), pz.Header.read(in_))
+    assert not (tmp_path / 'none.bin').exists()
+
+def token_bytes(stats) -> int:
+    return stats['literals'] + sum(int(length) * count for length, count in stats['match_lengths'].items())
+
+@pytest.mark.parametrize('level, mapped', [(1, False), (5, False), (8, False), (2, True)])
+def test_stats(tmp_path, level, mapped):
+    data = gen_binary(100_000)
+    in_path, out_path = tmp_path / 'data.bin', tmp_path / 'data.lzs'
+    in_path.write_bytes(data)
+    stats = pz.Stats()
+    pz.encode(str(in_path), str(out_path), None, pz.level_context(level), stats=stats, mapped=mapped)
+    summary = stats.summary()
+    assert summary['bytes_in'] == len(data) == token_bytes(summary)
+    assert summary['bytes_out'] == out_path.stat().st_size - pz.Header.packed_size(out_path.read_bytes())
+    assert summary['average_search_depth'] is not None
+    stats = pz.Stats()
+    with open(out_path, 'rb') as in_:
+        header = pz.Header.read(in_)
+        pz.decode_stream(in_, lambda data: None, header.context, header, stats=stats)
+    summary = stats.summary()
+    assert summary['bytes_out'] == len(data) == token_bytes(summary)
+    assert summary['bytes_in'] == out_path.stat().st_size - pz.Header.packed_size(out_path.read_bytes())
+
+def test_stats_option(tmp_path):
+    pytest.importorskip('docopt')
+    data = gen_binary(50_000)
+    (tmp_path / 'data.bin').write_bytes(data)
+    output = subprocess.run(
+        [sys.executable, PZYP, '-c', '--stats', 'data.bin'],
+        cwd=tmp_path, capture_output=True, text=True, check=True,
+    ).stdout
+    summary = json.loads(output[output.index('{'):])
+    assert summary['bytes_in'] == len(data) == token_bytes(summary)
+
+def test_pipe_has_trailer():
+    data = gen_binary(100_000)
+    out = Pipe()
+    pz.encode(io.BytesIO(data), out, None, pz.level_context(2))
+    blob = out.getvalue()
+    header = pz.Header.read(io.BytesIO(blob))
+    assert header.has_trailer and not header.size_known
+    assert decode_all(blob) == data
+    assert pz.decompress(blob) == data
+
+@pytest.mark.parametrize('pos', [100, -20, -3])
+def test_corrupted_trailer_stream(pos):
+    data = gen_binary(100_000)
+    compressor = pz.PzypCompressor(4)
+    blob = bytearray(compressor.compress(data) + compressor.flush())
+    blob[pos] ^= 0x10
+    with pytest.raises(pz.ChecksumError):
+        decode_all(bytes(blob))
+    decompressor = pz.PzypDecompressor()
+    with pytest.raises(pz.ChecksumError):
+        decompressor.decompress(bytes(blob))
+        decompressor.flush()
+
+def test_truncated_stream():
+    data = gen_binary(10_000)
+    blob = pz.compress(data)
+    for size in (len(blob) - 1, len(blob) // 2):
+        with pytest.raises((ValueError, lz.LZSSReader.UnreadData)):
+            pz.decompress(blob[:size])
+
+@pytest.mark.parametrize('level', [1, 2, 5, 8])
+def test_incremental(level):
+    data = gen_binary(150_000 if level < 8 else 30_000)
+    compressor = pz.PzypCompressor(level)
+    blob = b''.join(compressor.compress(chunk) for chunk in chunks(data)) + compressor.flush()
+    header_size = pz.Header.packed_size(blob)
+    reference = pz.compress(data, level)
+    assert blob[header_size:-pz.TRAILER.size] == reference[header_size:]
+    for source in (blob, reference):
+        decompressor = pz.PzypDecompressor()
+        result = b''.join(decompressor.decompress(chunk) for chunk in chunks(source, seed=1))
+        assert result + decompressor.flush() == data
+        assert decompressor.eof
+
+def test_parallel(tmp_path):
+    data = gen_binary(200_000)
+    in_path, out_path = tmp_path / 'data.bin', tmp_path / 'data.lzs'
+    in_path.write_bytes(data)
+    with open(in_path, 'rb') as in_, open(out_path, 'wb') as out:
+        pz.encode_parallel(in_, out, 1, pz.level_context(2), block_size=30_000)
+    blob = out_path.read_bytes()
+    assert pz.Header.read(io.BytesIO(blob)).blocks
+    assert pz.decompress(blob) == data
+    decompressor = pz.PzypDecompressor()
+    result = b''.join(decompressor.decompress(chunk) for chunk in chunks(blob))
+    assert result + decompressor.flush() == data
+
+def test_forged_size():
+    blob = bytearray(pz.compress(b'hello hello hello'))
+    blob[10:18] = (2 ** 40).to_bytes(8, 'little')
+    with pytest.raises(pz.ChecksumError):
+        pz.decompress(bytes(blob))
+
+def test_encrypted():
+    pytest.importorskip('cryptography')
+    data = gen_binary(150_000)
+    out = io.BytesIO()
+    pz.encode(io.BytesIO(data), out, None, pz.level_context(1), 'secret')
+    blob = out.getvalue()
+    header = pz.Header.read(io.BytesIO(blob))
+    assert header.encrypted and (header.original_size, header.crc) == (0, 0)
+    assert decode_all(blob, 'secret') == data
+    with pytest.raises(pz.DecryptionError):
+        decode_all(blob, 'wrong')
+    tampered = bytearray(blob)
+    tampered[6] ^= 0x01     # level
+    with pytest.raises(pz.DecryptionError):
+        decode_all(bytes(tampered), 'secret')
+
+# log2(n), r, p and the high byte of the frame size in the CRYPT_HEAD
+@pytest.mark.parametrize('pos, value', [(1, 24), (2, 255), (3, 200), (30, 0xff)])
+def test_forged_crypt_head(pos, value):
+    """
+    The scrypt parameters and the frame size are bounded before the
+    key is derived, since the head isn't authenticated yet.
+    """
+    pytest.importorskip('cryptography')
+    out = io.BytesIO()
+    pz.encode(io.BytesIO(b'hello'), out, None, pz.level_context(1), 'secret')
+    blob = bytearray(out.getvalue())
+    blob[pz.Header.packed_size(blob) + pos] = value
+    with pytest.raises(pz.DecryptionError):
+        decode_all(bytes(blob), 'secret')
+
+def record(rnd) -> bytes:
+    return (
+        f'{{"id": {rnd.randrange(10**6)}, "user": "user{rnd.randrange(100)}", '
+        f'"status": "{rnd.choice(["active", "disabled", "pending"])}", '
+        f'"score": {rnd.random():.3f}}}'
+    ).encode()
+
+def test_dictionary(tmp_path):
+    rnd = random.Random(0)
+    dictionary = pz.Dictionary(pz.train_dictionary([record(rnd) for _ in range(500)], 2048))
+    assert 0 < len(dictionary.data) <= 2048
+    path = tmp_path / 'records.dict'
+    dictionary.save(str(path))
+    dictionary = pz.Dictionary.load(str(path))
+    for level in (1, 4, 8):
+        data = record(rnd)
+        blob = pz.compress(data, level, dictionary)
+        assert len(blob) < len(pz.compress(data, level))
+        assert pz.Header.read(io.BytesIO(blob)).dictionary_id == dictionary.id
+        assert pz.decompress(blob, dictionary) == data
+        with pytest.raises(ValueError):
+            pz.decompress(blob)
+        with pytest.raises(ValueError):
+            pz.decompress(blob, pz.Dictionary(b'another dictionary'))
+    out = io.BytesIO()
+    pz.encode(io.BytesIO(data), out, None, pz.level_context(2), dictionary=dictionary)
+    in_ = io.BytesIO(out.getvalue())
+    header = pz.Header.read(in_)
+    result = bytearray()
+    pz.decode_stream(in_, result.extend, header.context, header, dictionary=dictionary)
+    assert result == data
+
+def test_failed_decoding_keeps_output(tmp_path):
+    pytest.importorskip('cryptography')
+    data = gen_binary(100_000)
+    in_path, out_path = tmp_path / 'data.lzs', tmp_path / 'data.bin'
+    with open(in_path, 'wb') as out:
+        pz.encode(io.BytesIO(data), out, None, pz.level_context(1), 'secret')
+    out_path.write_bytes(b'old')
+    for password in (None, 'wrong'):
+        with pytest.raises(pz.DecryptionError):
+            pz.decode_file(str(in_path), str(out_path), password)
+    assert out_path.read_bytes() == b'old'
+    assert sorted(os.listdir(tmp_path)) == ['data.bin', 'data.lzs']
+    out_path.unlink()
+    pz.decode_file(str(in_path), str(out_path), 'secret')
+    assert out_path.read_bytes() == data
+    # as if it had been created in place
+    assert out_path.stat().st_mode == in_path.stat().st_mode
+
+def test_decoding_memory_is_bounded():
+    """
+    A stream that decodes to 4 MB (one literal and the longest
+    references to it) is decoded with far less memory than that.
+    """
+    ctx = pz.level_context(4)
+    header = pz.Header.for_context(ctx, flags=pz.FLAG_NO_SIZE)
+    count = 4 * 2 ** 20 // ctx.max_string_size
+    with io.BytesIO() as out:
+        header.write(out)
+        with lz.LZSSWriter(out, ctx) as writer:
+            writer.write(b'a')
+            writer.write_many([(1, ctx.max_string_size)] * count)
+        blob = out.getvalue()
+    in_ = io.BytesIO(blob)
+    header = pz.Header.read(in_)
+    tracemalloc.start()
+    try:
+        total = pz.decode_stream(in_, lambda data: None, ctx, header)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert total == 1 + count * ctx.max_string_size
+    assert peak < 2 ** 20
+
+def test_encoding_streams_its_output():
+    """
+    Compressed data is written while the input is still being read,
+    instead of once the whole input is in memory.
+    """
+    data = gen_binary(1024 * 1024)
+    out = io.BytesIO()
+    written = []
+
+    class Source(io.RawIOBase):
+        def __init__(self):
+            super().__init__()
+            self._in = io.BytesIO(data)
+
+        def readable(self) -> bool:
+            return True
+
+        def readinto(self, buffer) -> int:
+            written.append(out.tell())
+            return self._in.readinto(buffer)
+
+    pz.encode(Source(), out, None, pz.level_context(1))
+    assert written[len(written) // 2] > pz.Header.packed_size(out.getvalue())
+
+def check_reads(f, data: bytes, seed=0):
+    rnd = random.Random(seed)
+    assert f.size == len(data)
+    for _ in range(50):
+        pos, size = rnd.randrange(len(data) + 10), rnd.choice([0, 1, 100, 40_000, 200_000])
+        assert f.seek(pos) == pos
+        assert f.read(size) == data[pos:pos + size]
+    f.seek(-1000, io.SEEK_END)
+    assert f.read() == data[-1000:]
+
+@pytest.mark.parametrize('kind', ['sequential', 'trailer', 'blocks'])
+def test_pzyp_file(tmp_path, monkeypatch, kind):
+    data = gen_binary(300_000)
+    path = tmp_path / 'data.lzs'
+    if kind == 'sequential':
+        pz.encode(io.BytesIO(data), str(path), None, pz.level_context(2))
+    elif kind == 'trailer':
+        out = Pipe()
+        pz.encode(io.BytesIO(data), out, None, pz.level_context(2))
+        path.write_bytes(out.getvalue())
+    else:
+        in_path = tmp_path / 'data.bin'
+        in_path.write_bytes(data)
+        with open(in_path, 'rb') as in_, open(path, 'wb') as out:
+            pz.encode_parallel(in_, out, 1, pz.level_context(2), block_size=70_000)
+    with pz.PzypFile(str(path), cache_size=2, index_span=50_000) as f:
+        check_reads(f, data)
+    index_path = tmp_path / ('data.lzs' + pz.INDEX_EXTENSION)
+    assert index_path.exists() == (kind != 'blocks')
+    if kind != 'blocks':
+        # the second time, the parts come from the cached index
+        def build_index(*_):
+            raise AssertionError('index not cached')
+        monkeypatch.setattr(pz.PzypFile, '_build_index', build_index)
+        with pz.PzypFile(str(path), cache_size=2, index_span=50_000) as f:
+            check_reads(f, data, seed=1)
+        with io.BufferedReader(pz.PzypFile(str(path))) as f:
+            assert f.read() == data